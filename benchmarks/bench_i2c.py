@@ -0,0 +1,105 @@
+# benchmarks/bench_i2c.py
+#
+# Per-operation time and allocation of the busio.i2c layers, measured against the
+# simulated bus in busio.i2c_sim so that only the Python overhead is counted.
+# Run on the unix port from the repo root:
+#     micropython benchmarks/bench_i2c.py
+
+import sys
+sys.path.insert(0, "")
+
+import gc, time
+from busio.i2c import (I2CBus, I2CDevice, I2CDeviceMixInRegisters, I2CDeviceMixInStructs,
+                       I2CRegister, I2CRWBits, I2CROBit, I2CROStruct)
+from busio.i2c_sim import SimI2C
+
+N = 1000
+ADDR = 0x40
+
+
+class Sensor(I2CDeviceMixInRegisters, I2CDeviceMixInStructs, I2CDevice):
+    DEFAULT_ADDRESS = ADDR
+    temperature = I2CRegister(0x10, 2, signed=True)
+    mode = I2CRWBits(3, 0x20, 2)
+    ready = I2CROBit(0x21, 0)
+    error = I2CROBit(0x21, 1)
+    overrun = I2CROBit(0x21, 2)
+    accel = I2CROStruct(0x30, "<3h")
+    accel_reuse = I2CROStruct(0x30, "<3h", reuse=True)
+
+class ShadowSensor(Sensor):
+    SHADOW_REGISTERS = True
+
+
+def _measure(name, func):
+    gc.collect()
+    gc.disable()
+    mem0 = gc.mem_alloc()
+    t0 = time.ticks_us()
+    for _ in range(N):
+        func()
+    elapsed = time.ticks_diff(time.ticks_us(), t0)
+    mem = gc.mem_alloc() - mem0
+    gc.enable()
+    print("%-34s %8d %8d" % (name, elapsed * 1000 // N, mem // N))
+
+def main():
+    sim = SimI2C()
+    sim.add_device(ADDR)
+    bus = I2CBus(sim)
+    dev = Sensor(bus, None)
+    shadow = ShadowSensor(bus, None, probe=False)
+    buf = bytearray(2)
+    one = memoryview(buf)[:1]
+    
+    batch = dev.batch()
+    for memaddr in (0x10, 0x11, 0x20, 0x21):
+        batch.read(memaddr)
+    
+    def set_mode():
+        dev.mode = 3
+    
+    def set_mode_shadow():
+        shadow.mode = 3
+    
+    def flags():
+        return dev.ready, dev.error, dev.overrun
+    
+    def flags_snapshot():
+        with dev.snapshot():
+            return dev.ready, dev.error, dev.overrun
+    
+    def four_registers():
+        dev.readfrom_mem_into(0x10, one)
+        dev.readfrom_mem_into(0x11, one)
+        dev.readfrom_mem_into(0x20, one)
+        dev.readfrom_mem_into(0x21, one)
+    
+    def locked_bus_read():
+        with bus:
+            bus.readfrom_mem_into(ADDR, 0x10, buf)
+    
+    print("%-34s %8s %8s" % ("operation", "ns/op", "bytes/op"))
+    _measure("SimI2C.readfrom_mem_into", lambda: sim.readfrom_mem_into(ADDR, 0x10, buf))
+    _measure("I2CBus.readfrom_mem_into + lock", locked_bus_read)
+    _measure("I2CDevice.readfrom_mem_into", lambda: dev.readfrom_mem_into(0x10, buf))
+    _measure("read_register()", lambda: dev.read_register(0x10, 2, signed=True))
+    _measure("I2CRegister descriptor get", lambda: dev.temperature)
+    _measure("I2CRWBits set", set_mode)
+    _measure("I2CRWBits set, shadowed", set_mode_shadow)
+    _measure("3 I2CROBit gets", flags)
+    _measure("3 I2CROBit gets, snapshot", flags_snapshot)
+    _measure("4 single-register reads", four_registers)
+    _measure("4 register reads, I2CBatch", batch.run)
+    _measure("I2CROStruct get", lambda: dev.accel)
+    _measure("I2CROStruct get, reuse", lambda: dev.accel_reuse)
+    
+    bus.enable_stats()
+    _measure("I2CDevice.readfrom_mem_into, stats", lambda: dev.readfrom_mem_into(0x10, buf))
+    bus.enable_stats(False)
+    
+    sim.nack_rate = 0.1
+    retrying = Sensor(bus, None, probe=False, retries=5, retry_delay_ms=0)
+    _measure("readfrom_mem_into, 10% NACKs", lambda: retrying.readfrom_mem_into(0x10, buf))
+
+main()
@@ -1,6 +1,7 @@
 # busio/i2c.py
 
 from micropython import const
+import micropython
 import machine
 import time
 import struct  # only needed for I2CDeviceMixInStructs and I2CStruct
@@ -51,6 +52,76 @@ def _allocate_lock():
         return _thread.allocate_lock()
 
 
+_LOCK_RECHECK_MS = const(20)
+
+_NACK_ERRNOS = (19, 5)  # ENODEV: address not acknowledged, EIO: data not acknowledged
+
+def _nbytes(buf, start=0, end=None):
+    # Bytes in buf[start:end]; arrays and typed memoryviews are sized in items
+    n = (len(buf) if end is None else end) - start
+    if isinstance(buf, (bytes, bytearray)):
+        return n
+    if not isinstance(buf, memoryview):
+        buf = memoryview(buf)
+    itemsize = getattr(buf, "itemsize", None)
+    if itemsize is None:  # ports built without memoryview.itemsize
+        itemsize = len(bytes(buf[:1])) if len(buf) else 1
+    return n * itemsize
+
+# Extension
+class I2CBusStats:
+    # Per-address counters collected by I2CBus (transfers, bytes, lock_wait) and I2CDevice (the rest).
+    # Times are in microseconds: lock_wait is spent waiting for the bus on behalf of a device,
+    # busy is spent holding it for an operation, including retries and, when synchronous, their back-off.
+    
+    FIELDS = ("transactions", "bytes", "operations", "retries", "nacks", "errors", "lock_wait_us", "busy_us", "max_busy_us")
+    
+    def __init__(self):
+        self._addrs = {}
+        self.t_start = time.ticks_ms()
+    
+    def _record(self, addr):
+        rec = self._addrs.get(addr)
+        if rec is None:
+            rec = self._addrs[addr] = [0] * len(self.FIELDS)
+        return rec
+    
+    def transfer(self, addr, nbytes):
+        rec = self._record(addr)
+        rec[0] += 1
+        rec[1] += nbytes
+    
+    def lock_wait(self, addr, wait_us):
+        self._record(addr)[6] += wait_us
+    
+    def operation(self, addr, retries, nacks, errors, busy_us):
+        rec = self._record(addr)
+        rec[2] += 1
+        rec[3] += retries
+        rec[4] += nacks
+        rec[5] += errors
+        rec[7] += busy_us
+        if busy_us > rec[8]:
+            rec[8] = busy_us
+    
+    def snapshot(self):
+        """Returns a copy of the counters as {address: {field: value}}."""
+        return {addr: dict(zip(self.FIELDS, rec)) for addr, rec in self._addrs.items()}
+    
+    def elapsed_ms(self):
+        return time.ticks_diff(time.ticks_ms(), self.t_start)
+    
+    def reset(self):
+        self._addrs.clear()
+        self.t_start = time.ticks_ms()
+    
+    def __repr__(self):
+        lines = ["addr " + " ".join(self.FIELDS)]
+        for addr in sorted(self._addrs):
+            lines.append("0x%02x " % addr + " ".join(str(v) for v in self._addrs[addr]))
+        return "\n".join(lines)
+
+
 class I2CBus:
     # based on the CircuitPython busio.i2c.I2C interface
     
@@ -66,6 +137,9 @@ class I2CBus:
             self._lock = _allocate_lock()
         else:
             self._lock = lock
+        self._async_lock = None
+        self._released = None
+        self.stats = None  # Extension, see enable_stats()
         
         # Pre-allocated buffers for modify_mem to avoid fragmentation
         self._long = bytearray(4)
@@ -87,9 +161,57 @@ class I2CBus:
     
     def unlock(self):
         self._lock.release()
+        if self._released is not None:
+            self._released.set()
+    
+    def _acquire(self, addr):
+        # Blocking acquire on behalf of the device at addr, whose stats record the wait
+        stats = self.stats
+        if stats is not None:
+            t0 = time.ticks_us()
+        if not self._lock.acquire(*_ACQUIRE_DEV):
+            raise RuntimeError("I2C bus lock failed")
+        if stats is not None:
+            stats.lock_wait(addr, time.ticks_diff(time.ticks_us(), t0))
+    
+    # Extension, waits for the bus by yielding to the event loop instead of blocking.
+    # Coroutines are queued in order on an asyncio.Lock and the one at the head sleeps
+    # until unlock() sets a ThreadSafeFlag, so the bus may also be released from another
+    # thread. A lock passed to __init__ may be released without unlock(), so the head
+    # also re-checks every _LOCK_RECHECK_MS. Synchronous users are still excluded.
+    # The wait is recorded in the stats when addr is given.
+    async def lock_async(self, addr=None):
+        import asyncio
+        stats = self.stats if addr is not None else None
+        if stats is not None:
+            t0 = time.ticks_us()
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+            self._released = asyncio.ThreadSafeFlag()
+        async with self._async_lock:
+            while not self._lock.acquire(False):
+                try:
+                    await asyncio.wait_for_ms(self._released.wait(), _LOCK_RECHECK_MS)
+                except asyncio.TimeoutError:
+                    pass
+        if stats is not None:
+            stats.lock_wait(addr, time.ticks_diff(time.ticks_us(), t0))
+    
+    # Extension, opt-in per-address transaction statistics
+    def enable_stats(self, enable=True):
+        self.stats = I2CBusStats() if enable else None
+        return self.stats
     
     # Helper methods
     
+    def _count(self, addr, nbytes):
+        if self.stats is not None:
+            self.stats.transfer(addr, nbytes)
+    
+    def _count_buf(self, addr, buf, start=0, end=None):
+        if self.stats is not None:
+            self.stats.transfer(addr, _nbytes(buf, start, end))
+    
     def _require_lock(self):
         if not self._lock.locked():
             raise RuntimeError("I2C bus is not locked")
@@ -113,11 +235,13 @@ class I2CBus:
     
     def readfrom(self, addr, nbytes, stop=True):
         self._require_lock()
+        self._count(addr, nbytes)
         return self._i2c.readfrom(addr, nbytes, stop)
     
     # MicroPython has this natively, but without the start and end parameters needed for CircuitPython-compatibility
     def readfrom_into(self, addr, buf, stop=True, *, start=0, end=None):
         self._require_lock()
+        self._count_buf(addr, buf, start, end)
         if start == 0 and (end is None or end == len(buf)):
             return self._i2c.readfrom_into(addr, buf, stop)
         elif isinstance(buf, memoryview):
@@ -129,6 +253,7 @@ class I2CBus:
     # MicroPython has this natively, but without the start and end parameters needed for CircuitPython-compatibility
     def writeto(self, addr, buf, stop=True, *, start=0, end=None):
         self._require_lock()
+        self._count_buf(addr, buf, start, end)
         if start == 0 and (end is None or end == len(buf)):
             return self._i2c.writeto(addr, buf, stop)
         elif isinstance(buf, memoryview):
@@ -139,15 +264,19 @@ class I2CBus:
     
     def writevto(self, addr, vector, stop=True):
         self._require_lock()
+        if self.stats is not None:
+            self.stats.transfer(addr, sum(_nbytes(buf) for buf in vector))
         return self._i2c.writevto(addr, vector, stop)
     
     def readfrom_mem(self, addr, memaddr, nbytes, *, addrsize=8):
         self._require_lock()
+        self._count(addr, nbytes)
         return self._i2c.readfrom_mem(addr, memaddr, nbytes, addrsize=addrsize)
     
     # MicroPython has this natively, but without the start and end parameters needed for CircuitPython-compatibility
     def readfrom_mem_into(self, addr, memaddr, buf, *, start=0, end=None, addrsize=8):
         self._require_lock()
+        self._count_buf(addr, buf, start, end)
         if start != 0 or (end is not None and end != len(buf)):
             if not isinstance(buf, memoryview):
                 buf = memoryview(buf)
@@ -157,6 +286,7 @@ class I2CBus:
     # MicroPython has this natively, but without the start and end parameters needed for CircuitPython-compatibility
     def writeto_mem(self, addr, memaddr, buf, *, start=0, end=None, addrsize=8):
         self._require_lock()
+        self._count_buf(addr, buf, start, end)
         if start != 0 or (end is not None and end != len(buf)):
             if not isinstance(buf, memoryview):
                 buf = memoryview(buf)
@@ -173,6 +303,7 @@ class I2CBus:
         buf = self._byte if (mode == MODE_8) else self._word
         
         if clrbits is not None:
+            self._count(addr, len(buf))
             self._i2c.readfrom_mem_into(addr, memaddr, buf, addrsize=addrsize)
             
             # Decode buffer to int
@@ -195,6 +326,7 @@ class I2CBus:
         else:
             buf[0] = val & 0xFF
         
+        self._count(addr, len(buf))
         self._i2c.writeto_mem(addr, memaddr, buf, addrsize=addrsize)
     
     # CircuitPython-specific operations
@@ -255,6 +387,10 @@ class I2CDevice:
             self._scratch_ba = bytearray(self.SCRATCH_SIZE)
             self._scratch_mv = memoryview(self._scratch_ba)
         
+        # Extension, register values cached by I2CDeviceMixInRegisters
+        self._shadow = {} if getattr(self, 'SHADOW_REGISTERS', False) else None
+        self._snapshot = None
+        
         if isinstance(address, int) and not probe:
             self._address = address
             return
@@ -277,44 +413,88 @@ class I2CDevice:
     def __enter__(self):
         if self._in_context:
             raise RuntimeError("I2C device is already locked")
-        if not self._bus._lock.acquire(*_ACQUIRE_DEV):
-            raise RuntimeError("I2C bus lock failed")
+        self._bus._acquire(self._address)
         self._in_context = True
         return self
     
     def __exit__(self, exc_type, exc_value, traceback):
         self._in_context = False
-        self._bus._lock.release()
+        self._bus.unlock()
         return False
     
+    async def __aenter__(self):
+        if self._in_context:
+            raise RuntimeError("I2C device is already locked")
+        await self._bus.lock_async(self._address)
+        self._in_context = True
+        return self
+    
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        return self.__exit__(exc_type, exc_value, traceback)
+    
     # Helper methods
     
+    # Extension, drops cached register values that a write of nbytes at memaddr may have
+    # changed (all of them when memaddr is None), see I2CDeviceMixInRegisters
+    def _written(self, memaddr, nbytes):
+        shadow = self._shadow
+        snap = self._snapshot
+        if memaddr is None:
+            if shadow:
+                shadow.clear()
+            if snap:
+                snap.clear()
+            return
+        end = memaddr + nbytes
+        if shadow:
+            # 16-bit values starting one register earlier overlap the write too
+            for key in [key for key in shadow if memaddr - 1 <= key >> 2 < end]:
+                del shadow[key]
+        if snap:
+            for addr in [addr for addr in snap if memaddr <= addr < end]:
+                del snap[addr]
+    
     def _run(self, method, *args, retries=None, retry_delay_ms=None, **kwargs):
         if retries is None:
             retries = self._retries
         if retry_delay_ms is None:
             retry_delay_ms = self._retry_delay_ms
         
-        just_locked = False
-        if not self._in_context:
-            if not self._bus._lock.acquire(*_ACQUIRE_DEV):
-                raise RuntimeError("I2C bus lock failed")
-            just_locked = True
+        if self._in_context:
+            return self._transfer(method, args, kwargs, retries, retry_delay_ms)
         
+        self._bus._acquire(self._address)
         try:
-            last_exc = None
-            for i in range(max(1, retries + 1)):
-                try:
-                    if i > 0:
-                        time.sleep_ms(retry_delay_ms)
-                    return method(self._address, *args, **kwargs)
-                except OSError as e:
-                    last_exc = e
-            if last_exc is not None:
-                raise last_exc
+            return self._transfer(method, args, kwargs, retries, retry_delay_ms)
         finally:
-            if just_locked:
-                self._bus._lock.release()
+            self._bus.unlock()
+    
+    def _transfer(self, method, args, kwargs, retries, retry_delay_ms):
+        # Calls method with the bus already held, retrying on OSError
+        stats = self._bus.stats
+        if stats is not None:
+            t1 = time.ticks_us()
+            nacks = errors = 0
+        
+        last_exc = None
+        for i in range(max(1, retries + 1)):
+            try:
+                if i > 0:
+                    time.sleep_ms(retry_delay_ms)
+                result = method(self._address, *args, **kwargs)
+                if stats is not None:
+                    stats.operation(self._address, i, nacks, errors, time.ticks_diff(time.ticks_us(), t1))
+                return result
+            except OSError as e:
+                last_exc = e
+                if stats is not None:
+                    if e.args and e.args[0] in _NACK_ERRNOS:
+                        nacks += 1
+                    else:
+                        errors += 1
+        if stats is not None:
+            stats.operation(self._address, i, nacks, errors, time.ticks_diff(time.ticks_us(), t1))
+        raise last_exc
     
     # Micropython standard operations
     
@@ -325,9 +505,11 @@ class I2CDevice:
         self._run(self._bus.readfrom_into, buf, stop, start=start, end=end)
     
     def writeto(self, buf, stop=True, *, start=0, end=None):
+        self._written(None, 0)
         return self._run(self._bus.writeto, buf, stop, start=start, end=end)
     
     def writevto(self, vector, stop=True):
+        self._written(None, 0)
         return self._run(self._bus.writevto, vector, stop)
     
     def readfrom_mem(self, memaddr, nbytes, *, addrsize=None):
@@ -343,12 +525,14 @@ class I2CDevice:
     def writeto_mem(self, memaddr, buf, *, start=0, end=None, addrsize=None):
         if addrsize is None:
             addrsize = self._addrsize
+        self._written(memaddr, _nbytes(buf, start, end))
         return self._run(self._bus.writeto_mem, memaddr, buf, start=start, end=end, addrsize=addrsize)
     
     # Extension
     def modify_mem(self, memaddr, mode, setbits, clrbits=None, *, addrsize=None):
         if addrsize is None:
             addrsize = self._addrsize
+        self._written(memaddr, 1 if mode == MODE_8 else 2)
         return self._run(self._bus.modify_mem, memaddr, mode, setbits, clrbits, addrsize=addrsize)
     
     # CircuitPython-specific operations
@@ -356,6 +540,110 @@ class I2CDevice:
     def writeto_then_readfrom(self, out_buffer, in_buffer, *, out_start=0, out_end=None, in_start=0, in_end=None):
         return self._run(self._bus.writeto_then_readfrom, out_buffer, in_buffer, out_start=out_start, out_end=out_end, in_start=in_start, in_end=in_end)
     
+    # Extension, asyncio variants
+    
+    async def _run_async(self, method, *args, retries=None, retry_delay_ms=None, **kwargs):
+        # As _run(), but the bus is taken via lock_async() and released during the back-off
+        import asyncio
+        if retries is None:
+            retries = self._retries
+        if retry_delay_ms is None:
+            retry_delay_ms = self._retry_delay_ms
+        
+        stats = self._bus.stats
+        nacks = errors = busy = 0
+        for i in range(max(1, retries + 1)):
+            if i > 0:
+                await asyncio.sleep_ms(retry_delay_ms)
+            just_locked = False
+            if not self._in_context:
+                await self._bus.lock_async(self._address)
+                just_locked = True
+            if stats is not None:
+                t0 = time.ticks_us()
+            try:
+                # No await while the bus is held
+                result = method(self._address, *args, **kwargs)
+                last_exc = None
+            except OSError as e:
+                last_exc = e
+            finally:
+                if stats is not None:
+                    busy += time.ticks_diff(time.ticks_us(), t0)
+                if just_locked:
+                    self._bus.unlock()
+            if last_exc is None:
+                if stats is not None:
+                    stats.operation(self._address, i, nacks, errors, busy)
+                return result
+            if stats is not None:
+                if last_exc.args and last_exc.args[0] in _NACK_ERRNOS:
+                    nacks += 1
+                else:
+                    errors += 1
+        if stats is not None:
+            stats.operation(self._address, i, nacks, errors, busy)
+        raise last_exc
+    
+    async def run_async(self, func, *args, **kwargs):
+        """
+        Calls func(*args, **kwargs), a synchronous function using this device, with the bus
+        lock taken via lock_async(). Device operations inside func retry as usual, blocking
+        during the back-off; the *_async operations release the bus instead.
+        """
+        if self._in_context:
+            return func(*args, **kwargs)
+        await self._bus.lock_async(self._address)
+        self._in_context = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._in_context = False
+            self._bus.unlock()
+    
+    async def readfrom_async(self, nbytes, stop=True):
+        return await self._run_async(self._bus.readfrom, nbytes, stop)
+    
+    async def readfrom_into_async(self, buf, stop=True, *, start=0, end=None):
+        await self._run_async(self._bus.readfrom_into, buf, stop, start=start, end=end)
+    
+    async def writeto_async(self, buf, stop=True, *, start=0, end=None):
+        self._written(None, 0)
+        return await self._run_async(self._bus.writeto, buf, stop, start=start, end=end)
+    
+    async def writevto_async(self, vector, stop=True):
+        self._written(None, 0)
+        return await self._run_async(self._bus.writevto, vector, stop)
+    
+    async def readfrom_mem_async(self, memaddr, nbytes, *, addrsize=None):
+        if addrsize is None:
+            addrsize = self._addrsize
+        return await self._run_async(self._bus.readfrom_mem, memaddr, nbytes, addrsize=addrsize)
+    
+    async def readfrom_mem_into_async(self, memaddr, buf, *, start=0, end=None, addrsize=None):
+        if addrsize is None:
+            addrsize = self._addrsize
+        return await self._run_async(self._bus.readfrom_mem_into, memaddr, buf, start=start, end=end, addrsize=addrsize)
+    
+    async def writeto_mem_async(self, memaddr, buf, *, start=0, end=None, addrsize=None):
+        if addrsize is None:
+            addrsize = self._addrsize
+        self._written(memaddr, _nbytes(buf, start, end))
+        return await self._run_async(self._bus.writeto_mem, memaddr, buf, start=start, end=end, addrsize=addrsize)
+    
+    async def modify_mem_async(self, memaddr, mode, setbits, clrbits=None, *, addrsize=None):
+        if addrsize is None:
+            addrsize = self._addrsize
+        self._written(memaddr, 1 if mode == MODE_8 else 2)
+        return await self._run_async(self._bus.modify_mem, memaddr, mode, setbits, clrbits, addrsize=addrsize)
+    
+    async def writeto_then_readfrom_async(self, out_buffer, in_buffer, *, out_start=0, out_end=None, in_start=0, in_end=None):
+        return await self._run_async(self._bus.writeto_then_readfrom, out_buffer, in_buffer, out_start=out_start, out_end=out_end, in_start=in_start, in_end=in_end)
+    
+    # Extension
+    def batch(self, size=32):
+        return I2CBatch(self, size)
+    
     # adafruit_bus_device.i2c_device.I2CDevice aliases
     
     readinto = readfrom_into
@@ -363,6 +651,181 @@ class I2CDevice:
     write_then_readinto = writeto_then_readfrom
 
 
+# Extension
+class I2CBatch:
+    # Queued register reads and writes for one device, executed under a single lock acquisition.
+    # Operations on consecutive register addresses are merged into one burst transfer,
+    # so the device must auto-increment its register pointer (most do).
+    # A batch can be built once and run repeatedly without allocating.
+    
+    def __init__(self, device, size=32):
+        self._device = device
+        self._buf = bytearray(size)
+        self._mv = memoryview(self._buf)
+        self._used = 0
+        self._ops = []      # (is_write, memaddr, start, end)
+        self._bursts = None # (is_write, memaddr, view), built on first run
+    
+    def __len__(self):
+        return len(self._ops)
+    
+    @property
+    def buffer(self):
+        return self._mv[:self._used]
+    
+    def clear(self):
+        self._used = 0
+        self._ops.clear()
+        self._bursts = None
+    
+    def _reserve(self, nbytes):
+        start = self._used
+        end = start + nbytes
+        if nbytes <= 0 or end > len(self._buf):
+            raise ValueError("batch buffer full")
+        self._used = end
+        self._bursts = None
+        return start, end
+    
+    def read(self, memaddr, nbytes=1):
+        """Queues a register read. Returns the view that receives the data on run()."""
+        start, end = self._reserve(nbytes)
+        self._ops.append((False, memaddr, start, end))
+        return self._mv[start:end]
+    
+    def write(self, memaddr, data):
+        """Queues a register write. Returns the staged bytes, which may be updated between runs."""
+        start, end = self._reserve(len(data))
+        self._mv[start:end] = data
+        self._ops.append((True, memaddr, start, end))
+        return self._mv[start:end]
+    
+    def _merge(self):
+        bursts = []
+        cur = None
+        for op in self._ops:
+            if cur is not None and op[0] == cur[0] and op[1] == cur[1] + (cur[3] - cur[2]) and op[2] == cur[3]:
+                cur = (cur[0], cur[1], cur[2], op[3])
+            else:
+                if cur is not None:
+                    bursts.append(cur)
+                cur = op
+        if cur is not None:
+            bursts.append(cur)
+        self._bursts = [(w, memaddr, self._mv[start:end]) for w, memaddr, start, end in bursts]
+    
+    def _execute(self):
+        device = self._device
+        bus = device._bus
+        for is_write, memaddr, view in self._bursts:
+            if is_write:
+                device._written(memaddr, len(view))
+                device._run(bus.writeto_mem, memaddr, view, addrsize=device._addrsize)
+            else:
+                device._run(bus.readfrom_mem_into, memaddr, view, addrsize=device._addrsize)
+    
+    def run(self):
+        """Executes the queued operations in order. Returns the result buffer."""
+        if self._bursts is None:
+            self._merge()
+        if self._device._in_context:
+            self._execute()
+        else:
+            with self._device:
+                self._execute()
+        return self.buffer
+
+
+# Extension
+class I2CFifo:
+    # Drains a device FIFO in burst reads into two preallocated buffers, used alternately.
+    # Records are exposed as typed memoryviews of an array (native byte order) without
+    # unpacking. drain() blocks until the reads are done; because it fills the buffer not
+    # returned last time, the previous batch stays intact and can still be compared or
+    # finished with. A view is only valid until the drain() after next.
+    #
+    # level_register is read first to find how many records are waiting (level_mask and
+    # level_in_bytes describe its contents); without one, pass the count to drain().
+    # max_burst limits the bytes per transfer for controllers with small buffers.
+    
+    def __init__(self, device, data_register, record_size, capacity, *, typecode="B",
+                 level_register=None, level_width=1, level_lsb_first=True, level_mask=None,
+                 level_in_bytes=False, max_burst=None):
+        from array import array
+        self._device = device
+        self._data_register = data_register
+        self.record_size = record_size
+        self.capacity = capacity
+        
+        itemsize = len(bytes(array(typecode, [0])))
+        if record_size % itemsize:
+            raise ValueError("record_size must be a multiple of the item size")
+        self.record_items = record_size // itemsize
+        nitems = capacity * self.record_items
+        self._bufs = (array(typecode, [0] * nitems), array(typecode, [0] * nitems))
+        self._views = (memoryview(self._bufs[0]), memoryview(self._bufs[1]))
+        self._back = 0
+        
+        self._level_register = level_register
+        self._level_buf = bytearray(level_width)
+        self._level_lsb_first = level_lsb_first
+        self._level_mask = level_mask
+        self._level_in_bytes = level_in_bytes
+        
+        if max_burst is None:
+            self._burst_records = capacity
+        else:
+            self._burst_records = max(1, max_burst // record_size)
+        
+        self.count = 0      # records returned by the last drain()
+        self.pending = 0    # records left in the device FIFO after the last drain()
+    
+    def level(self):
+        """Returns the number of records waiting in the device FIFO."""
+        buf = self._level_buf
+        self._device.readfrom_mem_into(self._level_register, buf)
+        if len(buf) == 1:
+            val = buf[0]
+        elif self._level_lsb_first:
+            val = (buf[1] << 8) | buf[0]
+        else:
+            val = (buf[0] << 8) | buf[1]
+        if self._level_mask is not None:
+            val &= self._level_mask
+        if self._level_in_bytes:
+            val //= self.record_size
+        return val
+    
+    def _drain(self, count):
+        if count is None:
+            count = self.level()
+        n = min(count, self.capacity)
+        self.pending = count - n
+        
+        device = self._device
+        bus = device._bus
+        view = self._views[self._back]
+        items = self.record_items
+        step = self._burst_records * items
+        end = n * items
+        for start in range(0, end, step):
+            device._run(bus.readfrom_mem_into, self._data_register, view,
+                        start=start, end=min(start + step, end), addrsize=device._addrsize)
+        return n
+    
+    def drain(self, count=None):
+        """Reads up to capacity records into the buffer not returned last time and returns them."""
+        if self._device._in_context:
+            n = self._drain(count)
+        else:
+            with self._device:
+                n = self._drain(count)
+        self.count = n
+        view = self._views[self._back]
+        self._back ^= 1
+        return view[:n * self.record_items]
+
+
 class I2CDeviceMixInStructs:
     
     SCRATCH_SIZE = const(32)
@@ -428,165 +891,543 @@ class I2CDeviceMixInStructs:
     
     def writestructto(self, fmt, *values):
         return self.writestructto_mem(None, fmt, *values)
+    
+    # Extension, used by the struct descriptors
+    
+    def _layout_state(self, layout):
+        # This device's [buf, result] for layout, allocated on first use
+        states = getattr(self, "_layout_states", None)
+        if states is None:
+            states = self._layout_states = {}
+        state = states.get(layout)
+        if state is None:
+            state = states[layout] = layout.allocate()
+        return state
+    
+    def _read_layout(self, memaddr, layout):
+        state = self._layout_state(layout)
+        if memaddr is None:
+            self.readfrom_into(state[0])
+        else:
+            self.readfrom_mem_into(memaddr, state[0])
+        return layout.unpack(state)
+    
+    def _write_layout(self, memaddr, layout, values):
+        buf = self._layout_state(layout)[0]
+        struct.pack_into(layout.fmt, buf, 0, *values)
+        if memaddr is None:
+            return self.writeto(buf)
+        else:
+            return self.writeto_mem(memaddr, buf)
+
+
+# Extension
+class _StructLayout:
+    # A struct format compiled once per descriptor. Each device instance gets its own
+    # [buf, result] from allocate() (see I2CDeviceMixInStructs._layout_state).
+    # With reuse=True, reads return the same object every time: formats made of a single
+    # repeated type in native byte order are read straight into an array (no unpacking),
+    # anything else is unpacked into a reusable list.
+    
+    def __init__(self, fmt, reuse=False):
+        self.fmt = fmt
+        self.size = struct.calcsize(fmt)
+        self._array = None   # zeroed template for the array case
+        self._nvalues = 0    # length of the reusable list otherwise
+        if reuse:
+            self._array = _uniform_array(fmt, self.size)
+            if self._array is None:
+                self._nvalues = len(struct.unpack(fmt, bytes(self.size)))
+    
+    def allocate(self):
+        if self._array is not None:
+            arr = self._array[:]
+            return [arr, arr]
+        return [bytearray(self.size), [0] * self._nvalues if self._nvalues else None]
+    
+    def unpack(self, state):
+        buf, result = state
+        if result is None:
+            return struct.unpack(self.fmt, buf)
+        if result is buf:
+            return result
+        values = struct.unpack(self.fmt, buf)
+        for i in range(len(values)):
+            result[i] = values[i]
+        return result
+
+def _uniform_array(fmt, size):
+    # Returns a zeroed array that has the same memory layout as fmt, or None
+    import sys
+    from array import array
+    if fmt[:1] in "<>!=@":
+        order, fmt = fmt[0], fmt[1:]
+    else:
+        order = "@"
+    if order == "!":
+        order = ">"
+    if order in "<>" and order != ("<" if sys.byteorder == "little" else ">"):
+        return None
+    count = fmt.rstrip("bBhHiIlLqQfd")
+    code = fmt[len(count):]
+    if not code or code.strip(code[0]):
+        return None
+    if count:
+        if len(code) != 1 or not count.isdigit():
+            return None
+        n = int(count)
+    else:
+        n = len(code)
+    code = code[0]
+    if struct.calcsize(order + code) * n != size:
+        return None
+    arr = array(code, [0] * n)
+    if len(bytes(arr)) != size:
+        return None
+    return arr
+
+
+# Extension, validated and precomputed register access parameters:
+#     (address, width, lsb_first, shift, mask, signbit, signed, volatile, full)
+# lsb_first is None when it should come from the device's DEFAULT_LSB_FIRST.
+def _register_plan(address, width=1, lsb_first=None, num_bits=None, lowest_bit=0, signed=None, volatile=False):
+    if width != 1 and width != 2:
+        raise ValueError("width must be 1 or 2")
+    if num_bits is None:
+        num_bits = width * 8
+    if not (0 <= num_bits + lowest_bit <= width * 8):
+        raise ValueError("bitfield invalid")
+    if lsb_first is not None:
+        lsb_first = bool(lsb_first)
+    mask = (1 << num_bits) - 1
+    signbit = (1 << (num_bits - 1)) if (signed and num_bits > 0) else 0
+    full = (num_bits == width * 8)
+    return (address, width, lsb_first, lowest_bit, mask, signbit, signed, bool(volatile), full)
+
+
+def _field_value(plan, raw):
+    val = (raw >> plan[3]) & plan[4]
+    signbit = plan[5]
+    if val & signbit:
+        val -= signbit << 1
+    return val
 
 
 class I2CDeviceMixInRegisters:
     
     DEFAULT_LSB_FIRST = True
     
-    def read_register(self, address, width=1, lsb_first=None, num_bits=None, lowest_bit=0, *, signed=False):
-        """Reads an 8- or 16-bit value from a register."""
-        
-        if lsb_first is None:
-            lsb_first = self.DEFAULT_LSB_FIRST
-        
-        if width == 1:
-            buf = self._byte
-        elif width == 2:
-            buf = self._word
+    # Extension, keep a shadow copy of non-volatile registers as the base for bitfield writes,
+    # so they don't need to read the register back first. Reads always go to the device and
+    # refresh the copy; writes through this device drop the registers they overlap.
+    # Call invalidate_registers() when registers that are written can also change by other means.
+    SHADOW_REGISTERS = False
+    
+    def invalidate_registers(self, address=None):
+        shadow = self._shadow
+        if shadow is None:
+            return
+        if address is None:
+            shadow.clear()
         else:
-            raise ValueError("width must be 1 or 2")
-        
-        if num_bits is None:
-            num_bits = width * 8
-        
-        if not (0 <= num_bits + lowest_bit <= width * 8):
-            raise ValueError("bitfield invalid")
-        
-        self.readfrom_mem_into(address, buf)
+            for i in range(4):
+                shadow.pop((address << 2) | i, None)
+    
+    # Extension, within "with device.snapshot():" each register byte is read at most once
+    def snapshot(self):
+        cm = getattr(self, "_snapshot_cm", None)
+        if cm is None:
+            cm = self._snapshot_cm = _RegisterSnapshot(self)
+        return cm
+    
+    def _lookup_raw(self, address, width, lsb_first):
+        snap = self._snapshot
+        if snap is not None:
+            b0 = snap.get(address)
+            if b0 is not None:
+                if width == 1:
+                    return b0
+                b1 = snap.get(address + 1)
+                if b1 is not None:
+                    return (b1 << 8) | b0 if lsb_first else (b0 << 8) | b1
+        return None
+    
+    def _store_raw(self, address, width, lsb_first, volatile, buf):
+        snap = self._snapshot
+        if snap is not None:
+            snap[address] = buf[0]
+            if width == 2:
+                snap[address + 1] = buf[1]
         if width == 1:
             val = buf[0]
-        elif width == 2:
-            if lsb_first:
-                val = (buf[1] << 8) | buf[0]
-            else:
-                val = (buf[0] << 8) | buf[1]
-        
-        if lowest_bit:
-            val >>= lowest_bit
-        
-        val &= ((1 << num_bits) - 1)
-        
-        if signed and (val & (1 << (num_bits - 1))):
-            val -= (1 << num_bits)
+        elif lsb_first:
+            val = (buf[1] << 8) | buf[0]
+        else:
+            val = (buf[0] << 8) | buf[1]
         
+        if self._shadow is not None and not volatile:
+            self._shadow[(address << 2) | ((width - 1) << 1) | lsb_first] = val
         return val
     
-    def write_register(self, value, address, width=1, lsb_first=None, num_bits=None, lowest_bit=0, *, signed=None):
-        """Writes an 8- or 16-bit value to a register."""
-        
+    def _read_raw(self, address, width, lsb_first, volatile):
+        val = self._lookup_raw(address, width, lsb_first)
+        if val is None:
+            buf = self._byte if (width == 1) else self._word
+            self.readfrom_mem_into(address, buf)
+            val = self._store_raw(address, width, lsb_first, volatile, buf)
+        return val
+    
+    async def _read_raw_async(self, address, width, lsb_first, volatile):
+        val = self._lookup_raw(address, width, lsb_first)
+        if val is None:
+            buf = self._byte if (width == 1) else self._word
+            await self.readfrom_mem_into_async(address, buf)
+            val = self._store_raw(address, width, lsb_first, volatile, buf)
+        return val
+    
+    def _read_plan(self, plan):
+        lsb_first = plan[2]
+        if lsb_first is None:
+            lsb_first = bool(self.DEFAULT_LSB_FIRST)
+        return _field_value(plan, self._read_raw(plan[0], plan[1], lsb_first, plan[7]))
+    
+    def _write_args(self, plan, value):
+        # Returns (address, width, lsb_first, mode, setbits, clrbits, shadow key)
+        # clrbits is None for a write of the whole register, the key is None when not cached
+        address, width, lsb_first, shift, mask, _, signed, volatile, full = plan
         if lsb_first is None:
-            lsb_first = self.DEFAULT_LSB_FIRST
+            lsb_first = bool(self.DEFAULT_LSB_FIRST)
         
         if width == 1:
             maxval = 256
             mode = MODE_8
-        elif width == 2:
-            maxval = 65536
-            if lsb_first:
-                mode = MODE_16LE
-            else:
-                mode = MODE_16BE
         else:
-            raise ValueError("width must be 1 or 2")
+            maxval = 65536
+            mode = MODE_16LE if lsb_first else MODE_16BE
         
-        if signed is None:
-            signed = bool(value < 0)
-        if signed and value < 0:
+        if value < 0 and (signed or signed is None):
             value += maxval
         if not (0 <= value < maxval):
             raise ValueError("value out of range")
         
-        if num_bits is None:
-            self.modify_mem(address, mode, value)
-            return
-        
-        if not (0 <= num_bits + lowest_bit <= width * 8):
-            raise ValueError("bitfield invalid")
+        snap = self._snapshot
+        if snap is not None:
+            for addr in range(address, address + width):
+                snap.pop(addr, None)
         
-        mask = (1 << num_bits) - 1
-        clrbits = mask << lowest_bit
-        setbits = (value & mask) << lowest_bit
+        key = None
+        if self._shadow is not None and not volatile:
+            key = (address << 2) | ((width - 1) << 1) | lsb_first
         
-        self.modify_mem(address, mode, setbits, clrbits)
+        if full:
+            return address, width, lsb_first, mode, value, None, key
+        return address, width, lsb_first, mode, (value & mask) << shift, mask << shift, key
+    
+    def _write_plan(self, plan, value):
+        address, width, lsb_first, mode, setbits, clrbits, key = self._write_args(plan, value)
+        if key is None:
+            self.modify_mem(address, mode, setbits, clrbits)
+            return
+        if clrbits is not None:
+            base = self._shadow.get(key)
+            if base is None:
+                base = self._read_raw(address, width, lsb_first, False)
+            setbits = (base & ~clrbits) | setbits
+        self.modify_mem(address, mode, setbits)
+        self._shadow[key] = setbits
+    
+    def read_register(self, address, width=1, lsb_first=None, num_bits=None, lowest_bit=0, *, signed=False, volatile=False):
+        """Reads an 8- or 16-bit value from a register."""
+        return self._read_plan(_register_plan(address, width, lsb_first, num_bits, lowest_bit, signed, volatile))
+    
+    def write_register(self, value, address, width=1, lsb_first=None, num_bits=None, lowest_bit=0, *, signed=None, volatile=False):
+        """Writes an 8- or 16-bit value to a register."""
+        self._write_plan(_register_plan(address, width, lsb_first, num_bits, lowest_bit, signed, volatile), value)
+    
+    # Extension, asyncio variants (see I2CDevice._run_async)
+    
+    async def read_register_async(self, address, width=1, lsb_first=None, num_bits=None, lowest_bit=0, *, signed=False, volatile=False):
+        plan = _register_plan(address, width, lsb_first, num_bits, lowest_bit, signed, volatile)
+        lsb_first = plan[2]
+        if lsb_first is None:
+            lsb_first = bool(self.DEFAULT_LSB_FIRST)
+        return _field_value(plan, await self._read_raw_async(address, width, lsb_first, plan[7]))
+    
+    async def write_register_async(self, value, address, width=1, lsb_first=None, num_bits=None, lowest_bit=0, *, signed=None, volatile=False):
+        plan = _register_plan(address, width, lsb_first, num_bits, lowest_bit, signed, volatile)
+        address, width, lsb_first, mode, setbits, clrbits, key = self._write_args(plan, value)
+        if key is None:
+            await self.modify_mem_async(address, mode, setbits, clrbits)
+            return
+        if clrbits is not None:
+            base = self._shadow.get(key)
+            if base is None:
+                base = await self._read_raw_async(address, width, lsb_first, False)
+            setbits = (base & ~clrbits) | setbits
+        await self.modify_mem_async(address, mode, setbits)
+        self._shadow[key] = setbits
+
+
+class _RegisterSnapshot:
+    
+    def __init__(self, device):
+        self._device = device
+        self._values = {}
+    
+    def __enter__(self):
+        if self._device._snapshot is not None:
+            raise RuntimeError("snapshot already active")
+        self._device._snapshot = self._values
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._device._snapshot = None
+        self._values.clear()
+        return False
 
 
 class I2CRegister:
     
-    def __init__(self, address, width=1, lsb_first=None, num_bits=None, lowest_bit=0, *, signed=None):
+    def __init__(self, address, width=1, lsb_first=None, num_bits=None, lowest_bit=0, *, signed=None, volatile=False):
         self.address = address
         self.width = width
         self.lsb_first = lsb_first
         self.num_bits = num_bits
         self.lowest_bit = lowest_bit
         self.signed = signed
+        self.volatile = volatile  # Extension, never taken from the shadow cache as a write base (e.g. status registers)
+        self._plan = _register_plan(address, width, lsb_first, num_bits, lowest_bit, signed, volatile)
     
     def __get__(self, instance, cls=None):
         if instance is None:
             return self
-        return instance.read_register(self.address, self.width, self.lsb_first, self.num_bits, self.lowest_bit, signed=self.signed)
+        return instance._read_plan(self._plan)
     
     def __set__(self, instance, value):
-        instance.write_register(value, self.address, self.width, self.lsb_first, self.num_bits, self.lowest_bit, signed=self.signed)
+        instance._write_plan(self._plan, value)
 
 
 # Based on adafruit_register.i2c_bit
 
 class I2CROBit:
     
-    def __init__(self, register_address: int, bit: int, register_width: int = 1, lsb_first: bool = True):
-        self.register = I2CRegister(register_address, register_width, lsb_first, 1, bit, signed=False)
+    def __init__(self, register_address: int, bit: int, register_width: int = 1, lsb_first: bool = True, *, volatile: bool = False):
+        self.register = I2CRegister(register_address, register_width, lsb_first, 1, bit, signed=False, volatile=volatile)
+        self._plan = self.register._plan
     
     def __get__(self, instance, cls=None):
         if instance is None:
             return self
-        return self.register.__get__(instance)
+        return instance._read_plan(self._plan)
 
 class I2CRWBit(I2CROBit):
     
     def __set__(self, instance, value):
-        self.register.__set__(instance, value)
+        instance._write_plan(self._plan, value)
 
 class I2CROBits:
     
-    def __init__(self, num_bits: int, register_address: int, lowest_bit: int, register_width: int = 1, lsb_first: bool = True, signed: bool = False):
-        self.register = I2CRegister(register_address, register_width, lsb_first, num_bits, lowest_bit, signed=signed)
+    def __init__(self, num_bits: int, register_address: int, lowest_bit: int, register_width: int = 1, lsb_first: bool = True, signed: bool = False, *, volatile: bool = False):
+        self.register = I2CRegister(register_address, register_width, lsb_first, num_bits, lowest_bit, signed=signed, volatile=volatile)
+        self._plan = self.register._plan
     
     def __get__(self, instance, cls=None):
         if instance is None:
             return self
-        return self.register.__get__(instance)
+        return instance._read_plan(self._plan)
 
 class I2CRWBits(I2CROBits):
     
     def __set__(self, instance, value):
-        self.register.__set__(instance, value)
+        instance._write_plan(self._plan, value)
 
 class I2CROUnaryStruct:
     def __init__(self, register_address: int, struct_format: str):
         self.register_address = register_address
         self.struct_format = struct_format
+        self._layout = _StructLayout(struct_format)
     
     def __get__(self, instance, cls=None):
         if instance is None:
             return self
-        return instance.readstructfrom_mem(self.register_address, self.struct_format)[0]
+        return instance._read_layout(self.register_address, self._layout)[0]
 
 class I2CUnaryStruct(I2CROUnaryStruct):
     def __set__(self, instance, value):
-        instance.writestructto_mem(self.register_address, self.struct_format, value)
+        instance._write_layout(self.register_address, self._layout, (value,))
 
 # extension
 class I2CROStruct:
-    def __init__(self, register_address: int, struct_format: str):
+    def __init__(self, register_address: int, struct_format: str, *, reuse: bool = False):
         self.register_address = register_address
         self.struct_format = struct_format
+        self._layout = _StructLayout(struct_format, reuse)
     
     def __get__(self, instance, cls=None):
         if instance is None:
             return self
-        return instance.readstructfrom_mem(self.register_address, self.struct_format)
+        return instance._read_layout(self.register_address, self._layout)
 
 class I2CStruct(I2CROStruct):
     def __set__(self, instance, value):
-        instance.writestructto_mem(self.register_address, self.struct_format, *value)
+        instance._write_layout(self.register_address, self._layout, value)
+
+
+# Extension, background sampling
+
+class I2CSampleRing:
+    # Fixed-size ring of samples and their time.ticks_ms() timestamps; old samples are overwritten.
+    
+    def __init__(self, size, typecode="i"):
+        from array import array
+        self.values = array(typecode, [0] * size)
+        self.times = array("I", [0] * size)
+        self.index = 0      # next slot to write
+        self.count = 0      # total samples written
+    
+    def __len__(self):
+        return min(self.count, len(self.values))
+    
+    def append(self, value, t):
+        i = self.index
+        self.values[i] = value
+        self.times[i] = t
+        i += 1
+        self.index = 0 if i == len(self.values) else i
+        self.count += 1
+    
+    def latest(self, back=0):
+        """Returns (value, ticks_ms) of the newest sample, or of the one `back` samples earlier."""
+        if back >= len(self):
+            raise IndexError("sample not available")
+        i = self.index - 1 - back
+        if i < 0:
+            i += len(self.values)
+        return self.values[i], self.times[i]
+
+
+class _SampleTask:
+    
+    def __init__(self, device, plan, period_ms, ring, due):
+        self.device = device
+        self.plan = plan
+        self.period_ms = period_ms
+        self.ring = ring
+        self.due = due
+        self.buf = bytearray(plan[1])
+        # Arguments for I2CDevice._transfer(bus.readfrom_mem_into, ...), built once
+        self.args = (plan[0], self.buf)
+        self.kwargs = {"addrsize": device._addrsize}
+        self.misses = 0     # sampling periods skipped because the read ran late
+        self.errors = 0     # reads that failed with OSError
+
+
+class I2CScheduler:
+    # Samples registers of many devices at fixed periods from one asyncio task (run())
+    # or a machine.Timer (start_timer()). Due reads on the same bus are done under a
+    # single lock acquisition; a bus that is busy is retried on the next poll.
+    # Reads are not retried, so a failed read only increments the task's error counter.
+    
+    def __init__(self):
+        self._groups = []   # [bus, [tasks]]
+        self._timer = None
+        # Bound methods are created up front, the timer callback must not allocate
+        self._timer_callback_ref = self._timer_callback
+        self._scheduled_poll_ref = self._scheduled_poll
+    
+    def add(self, device, register, period_ms, *, size=16, typecode="i"):
+        """
+        Samples register (an I2CRegister/I2CROBit/I2CROBits descriptor or a register
+        address) every period_ms. Returns the I2CSampleRing receiving the values.
+        """
+        plan = getattr(register, "_plan", None)
+        if plan is None:
+            plan = _register_plan(register)
+        ring = I2CSampleRing(size, typecode)
+        task = _SampleTask(device, plan, period_ms, ring, time.ticks_ms())
+        for group in self._groups:
+            if group[0] is device._bus:
+                group[1].append(task)
+                break
+        else:
+            self._groups.append([device._bus, [task]])
+        return ring
+    
+    def tasks(self):
+        return [task for group in self._groups for task in group[1]]
+    
+    def _sample(self, bus, task, now):
+        # The bus is already held; _transfer() does the error and stats accounting
+        device = task.device
+        try:
+            device._transfer(bus.readfrom_mem_into, task.args, task.kwargs, 0, 0)
+        except OSError:
+            task.errors += 1
+            return
+        plan = task.plan
+        buf = task.buf
+        if plan[1] == 1:
+            val = buf[0]
+        else:
+            lsb_first = plan[2]
+            if lsb_first is None:
+                lsb_first = getattr(device, "DEFAULT_LSB_FIRST", True)
+            val = (buf[1] << 8) | buf[0] if lsb_first else (buf[0] << 8) | buf[1]
+        task.ring.append(_field_value(plan, val), now)
+    
+    def poll(self):
+        """Runs the reads that are due. Returns ms until the next one is due."""
+        now = time.ticks_ms()
+        wait = None
+        for bus, tasks in self._groups:
+            locked = False
+            try:
+                for task in tasks:
+                    late = time.ticks_diff(now, task.due)
+                    if late >= 0:
+                        if not locked:
+                            locked = bus.try_lock()
+                            if not locked:
+                                wait = 0 if wait is None else min(wait, 1)
+                                break
+                        self._sample(bus, task, now)
+                        period = task.period_ms
+                        if late >= period:
+                            task.misses += late // period
+                            task.due = time.ticks_add(now, period)
+                        else:
+                            task.due = time.ticks_add(task.due, period)
+                    left = time.ticks_diff(task.due, now)
+                    wait = left if wait is None else min(wait, left)
+            finally:
+                if locked:
+                    bus.unlock()
+        return 0 if wait is None or wait < 0 else wait
+    
+    async def run(self):
+        """Polls forever from an asyncio task."""
+        import asyncio
+        while True:
+            await asyncio.sleep_ms(max(1, self.poll()))
+    
+    def _timer_callback(self, _):
+        try:
+            micropython.schedule(self._scheduled_poll_ref, None)
+        except RuntimeError:
+            pass  # schedule queue full, try again on the next tick
+    
+    def _scheduled_poll(self, _):
+        self.poll()
+    
+    def start_timer(self, timer_id=-1, tick_ms=None):
+        """Polls from a machine.Timer every tick_ms (default: the shortest period)."""
+        if tick_ms is None:
+            tick_ms = min(task.period_ms for task in self.tasks())
+        self.stop()
+        self._timer = machine.Timer(timer_id)
+        self._timer.init(period=tick_ms, mode=machine.Timer.PERIODIC, callback=self._timer_callback_ref)
+    
+    def stop(self):
+        if self._timer is not None:
+            self._timer.deinit()
+            self._timer = None
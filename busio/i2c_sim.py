@@ -0,0 +1,148 @@
+# busio/i2c_sim.py
+
+# A simulated machine.I2C backed by per-device register maps, for host-side tests and
+# benchmarks of busio.i2c (pass it to I2CBus in place of an I2C id).
+#
+# Each device has a register pointer that is set by the first addrsize/8 bytes of a
+# write and auto-increments (wrapping) on every byte read or written.
+
+from micropython import const
+import time
+import random
+import uctypes
+
+ENODEV = const(19)      # address not acknowledged
+ETIMEDOUT = const(110)  # injected bus error
+
+def _chance(rate):
+    return rate > 0 and random.getrandbits(16) < rate * 65536
+
+def _bytes_view(buf):
+    # A byte-indexed view of buf; typed memoryviews (e.g. from I2CFifo) are sized in items
+    if isinstance(buf, (bytes, bytearray)):
+        return buf
+    if not isinstance(buf, memoryview):
+        buf = memoryview(buf)
+    itemsize = getattr(buf, "itemsize", None)
+    if itemsize is None:  # ports built without memoryview.itemsize
+        itemsize = len(bytes(buf[:1])) if len(buf) else 1
+    if itemsize == 1:
+        return buf
+    return uctypes.bytearray_at(uctypes.addressof(buf), len(buf) * itemsize)
+
+
+class SimI2C:
+    
+    def __init__(self, *, latency_us=0, latency_us_per_byte=0, nack_rate=0.0, error_rate=0.0, log_size=0, seed=None):
+        self.latency_us = latency_us                    # per transaction
+        self.latency_us_per_byte = latency_us_per_byte
+        self.nack_rate = nack_rate                      # fraction of transactions failing with ENODEV
+        self.error_rate = error_rate                    # fraction of transactions failing with ETIMEDOUT
+        self.log_size = log_size                        # keep the last log_size transactions, 0 to disable
+        self.log = []
+        self.transactions = 0
+        self._devices = {}
+        if seed is not None:
+            random.seed(seed)
+    
+    def add_device(self, addr, size=256, data=None, addrsize=8):
+        """Adds a device and returns its register map, a bytearray that may be modified directly."""
+        regs = bytearray(size)
+        if data is not None:
+            regs[:len(data)] = data
+        self._devices[addr] = [regs, 0, addrsize // 8]  # registers, pointer, pointer bytes
+        return regs
+    
+    def registers(self, addr):
+        return self._devices[addr][0]
+    
+    def _begin(self, op, addr, memaddr, nbytes):
+        self.transactions += 1
+        if self.log_size:
+            if len(self.log) >= self.log_size:
+                self.log.pop(0)
+            self.log.append((op, addr, memaddr, nbytes))
+        delay = self.latency_us + self.latency_us_per_byte * nbytes
+        if delay > 0:
+            time.sleep_us(delay)
+        dev = self._devices.get(addr)
+        if dev is None or _chance(self.nack_rate):
+            raise OSError(ENODEV)
+        if _chance(self.error_rate):
+            raise OSError(ETIMEDOUT)
+        return dev
+    
+    @staticmethod
+    def _read(dev, buf):
+        regs, ptr = dev[0], dev[1]
+        size = len(regs)
+        n = len(buf)
+        if ptr + n <= size:
+            buf[:] = regs[ptr:ptr + n]
+        else:
+            for i in range(n):
+                buf[i] = regs[(ptr + i) % size]
+        dev[1] = (ptr + n) % size
+    
+    @staticmethod
+    def _write(dev, buf):
+        regs, ptr = dev[0], dev[1]
+        size = len(regs)
+        n = len(buf)
+        if ptr + n <= size:
+            regs[ptr:ptr + n] = buf
+        else:
+            for i in range(n):
+                regs[(ptr + i) % size] = buf[i]
+        dev[1] = (ptr + n) % size
+    
+    # machine.I2C interface
+    
+    def scan(self):
+        return sorted(self._devices)
+    
+    def deinit(self):
+        pass
+    
+    def readfrom_into(self, addr, buf, stop=True):
+        buf = _bytes_view(buf)
+        self._read(self._begin("r", addr, None, len(buf)), buf)
+    
+    def readfrom(self, addr, nbytes, stop=True):
+        buf = bytearray(nbytes)
+        self.readfrom_into(addr, buf, stop)
+        return bytes(buf)
+    
+    def writeto(self, addr, buf, stop=True):
+        buf = _bytes_view(buf)
+        dev = self._begin("w", addr, None, len(buf))
+        nptr = dev[2]
+        if len(buf) < nptr:
+            return len(buf) + 1  # address-only write, e.g. a probe
+        ptr = buf[0]
+        if nptr == 2:
+            ptr = (ptr << 8) | buf[1]
+        dev[1] = ptr % len(dev[0])
+        self._write(dev, memoryview(buf)[nptr:])
+        return len(buf) + 1
+    
+    def writevto(self, addr, vector, stop=True):
+        data = b"".join(bytes(buf) for buf in vector)
+        return self.writeto(addr, data, stop)
+    
+    def readfrom_mem_into(self, addr, memaddr, buf, *, addrsize=8):
+        buf = _bytes_view(buf)
+        dev = self._begin("rm", addr, memaddr, len(buf))
+        dev[1] = memaddr % len(dev[0])
+        self._read(dev, buf)
+    
+    def readfrom_mem(self, addr, memaddr, nbytes, *, addrsize=8):
+        buf = bytearray(nbytes)
+        self.readfrom_mem_into(addr, memaddr, buf, addrsize=addrsize)
+        return bytes(buf)
+    
+    def writeto_mem(self, addr, memaddr, buf, *, addrsize=8):
+        buf = _bytes_view(buf)
+        dev = self._begin("wm", addr, memaddr, len(buf))
+        dev[1] = memaddr % len(dev[0])
+        self._write(dev, buf)
@@ -1,4 +1,4 @@
-import micropython, socket, time
+import gc, micropython, socket, time
 
 HTTP_PORT = const(80)
 HTTPS_PORT = const(443)
@@ -11,6 +11,11 @@ _CS_IDLE = const(0)
 _CS_REQ_STARTED = const(1)
 _CS_REQ_SENT = const(2)
 
+# Transfer priorities for TokenBucket: urgent transfers never wait for tokens
+# (they may leave the bucket in debt, which later normal transfers pay off).
+PRIORITY_URGENT = const(0)
+PRIORITY_NORMAL = const(1)
+
 # HTTPResponse.close() reasons: controls whether the socket is actually closed
 # and whether the response is flagged as incomplete.
 _CR_DONE = const(0)       # clean finish (or user close mid-body)
@@ -86,6 +91,21 @@ def _validate_ascii(buf:ptr8, buflen:int, deny_flags:int) -> int:
         i += 1
     return 1
 
+@micropython.viper
+def _find_byte(buf:ptr8, b:int, start:int, end:int) -> int:
+    i = start
+    while i < end:
+        if buf[i] == b:
+            return i
+        i += 1
+    return -1
+
+def _find_nonspace(buf):
+    for b in buf:
+        if b > 32:
+            return True
+    return False
+
 def _encode_and_validate(b, charset, *, deny_flags=0, force_bytes=False):
     valid = False
     if isinstance(b, (bytes, bytearray, memoryview)):
@@ -103,9 +123,12 @@ def _encode_and_validate(b, charset, *, deny_flags=0, force_bytes=False):
         b = bytes(b)
     return b
 
-def _create_connection(address, timeout):
+def _create_connection(address, timeout, stats=None):
     host, port = address
-    for f, t, p, n, a in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM):
+    addrinfo = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    if stats is not None:
+        stats.t_dns = time.ticks_us()
+    for f, t, p, n, a in addrinfo:
         sock = None
         try:
             sock = socket.socket(f, t, p)
@@ -116,6 +139,8 @@ def _create_connection(address, timeout):
             except (AttributeError, OSError):
                 pass
             sock.connect(a)
+            if stats is not None:
+                stats.t_connect = time.ticks_us()
             return sock
         except Exception as e:
             if sock is not None:
@@ -130,6 +155,133 @@ def _create_connection(address, timeout):
 def create_connection(address, timeout=None):
     return _create_connection(address, timeout)
 
+# Extension: per-request timings (time.ticks_us), byte counts and heap usage.
+# Created by HTTPConnection.putrequest() when a hook or debuglevel is set, and
+# handed to the hook once the response body is complete (or abandoned).
+class RequestStats:
+    def __init__(self, method, url, hook=None):
+        self.method = method
+        self.url = url
+        self.hook = hook
+        self.status = None
+        self.t_start = time.ticks_us()
+        self.t_dns = None          # address resolved (new connections only)
+        self.t_connect = None      # TCP connected (new connections only)
+        self.t_tls = None          # TLS handshake done (HTTPS, new connections only)
+        self.t_sent = None         # request line, headers and body sent
+        self.t_first_byte = None   # status line received
+        self.t_done = None         # body complete or response closed
+        self.bytes_sent = 0
+        self.bytes_recv = 0        # body bytes, excluding chunked framing
+        self.mem_before = gc.mem_free()
+        self.mem_after = None
+        self.complete = False
+    
+    def elapsed(self, t):
+        # Microseconds from the start of the request to timestamp t, or None.
+        if t is None:
+            return None
+        return time.ticks_diff(t, self.t_start)
+    
+    def __repr__(self):
+        return "<RequestStats %s %s status=%s dns=%s connect=%s tls=%s sent=%s first_byte=%s done=%s tx=%d rx=%d mem=%s->%s>" % (
+            self.method, self.url, self.status,
+            self.elapsed(self.t_dns), self.elapsed(self.t_connect), self.elapsed(self.t_tls),
+            self.elapsed(self.t_sent), self.elapsed(self.t_first_byte), self.elapsed(self.t_done),
+            self.bytes_sent, self.bytes_recv, self.mem_before, self.mem_after)
+
+# Extension: a fixed-size ring buffer usable as an HTTPConnection hook.
+class StatsRing:
+    def __init__(self, size=8):
+        if size <= 0:
+            raise ValueError("size must be > 0")
+        self._items = [None] * size
+        self._next = 0
+        self.count = 0  # total records seen, including overwritten ones
+    
+    def __call__(self, stats):
+        self._items[self._next] = stats
+        self._next = (self._next + 1) % len(self._items)
+        self.count += 1
+    
+    def __len__(self):
+        return min(self.count, len(self._items))
+    
+    def records(self):
+        # Oldest first.
+        size = len(self._items)
+        n = len(self)
+        return [self._items[(self._next - n + i) % size] for i in range(n)]
+    
+    def clear(self):
+        for i in range(len(self._items)):
+            self._items[i] = None
+        self._next = 0
+        self.count = 0
+
+# Extension: token-bucket rate limiter in bytes/second, shared by any number of
+# connections. A bucket with a parent (e.g. per-host under per-session) charges
+# both. PRIORITY_URGENT only skips the wait: the tokens are still taken, and a
+# transfer already pacing itself is not interrupted, so the next normal
+# transfers wait longer to pay back the debt.
+class TokenBucket:
+    def __init__(self, rate, burst=None, *, parent=None):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = rate
+        self.burst = rate if burst is None else burst
+        self.parent = parent
+        self._tokens = self.burst
+        self._stamp = time.ticks_ms()
+    
+    def _refill(self, now):
+        elapsed = time.ticks_diff(now, self._stamp)
+        if elapsed <= 0:
+            return
+        added = elapsed * self.rate // 1000
+        if added <= 0:
+            return
+        self._tokens += added
+        if self._tokens >= self.burst:
+            self._tokens = self.burst
+            self._stamp = now
+        else:
+            # Keep the remainder so slow rates still accumulate.
+            self._stamp = time.ticks_add(self._stamp, added * 1000 // self.rate)
+    
+    def reserve(self, n, priority=PRIORITY_NORMAL):
+        # Takes n tokens now; returns how many ms to wait before transferring.
+        # Non-blocking, so asyncio callers can await the delay themselves.
+        now = time.ticks_ms()
+        self._refill(now)
+        wait = 0
+        if priority != PRIORITY_URGENT:
+            deficit = n - self._tokens
+            if deficit > 0:
+                wait = (deficit * 1000 + self.rate - 1) // self.rate
+        self._tokens -= n
+        if self.parent is not None:
+            parent_wait = self.parent.reserve(n, priority)
+            if parent_wait > wait:
+                wait = parent_wait
+        return wait
+    
+    def acquire(self, n, priority=PRIORITY_NORMAL):
+        wait = self.reserve(n, priority)
+        if wait > 0:
+            time.sleep_ms(wait)
+
+# Extension: one dispatched text/event-stream event.
+class ServerSentEvent:
+    def __init__(self, event, data, id=None, retry=None):
+        self.event = event
+        self.data = data
+        self.id = id        # last event ID in effect (persists across events)
+        self.retry = retry  # most recent reconnection time in ms, if any
+    
+    def __repr__(self):
+        return "<ServerSentEvent %s id=%r data=%r>" % (self.event, self.id, self.data)
+
 def parse_host_port(host, port, default_port=None):
     if port is None:
         i = host.rfind(':')
@@ -212,9 +364,16 @@ class HTTPResponse:
         self.content_length = None
         self.content_read = 0
         self._incomplete = False
+        self._stats = None
+        self._limiter = None
+        self._priority = PRIORITY_NORMAL
+        self._blocksize = 1024
     
     def begin(self, *, extra_headers=True):
         self.version, self.status, self.reason = self._read_status()
+        if self._stats is not None:
+            self._stats.t_first_byte = time.ticks_us()
+            self._stats.status = self.status
         if self.debuglevel > 0:
             print("status:", repr(self.version), repr(self.status), repr(self.reason))
         
@@ -333,6 +492,21 @@ class HTTPResponse:
                 sock.close()
             except OSError:
                 pass
+        
+        if self._stats is not None:
+            self._finish_stats(partial_body)
+    
+    def _finish_stats(self, partial_body):
+        stats = self._stats
+        self._stats = None
+        stats.t_done = time.ticks_us()
+        stats.bytes_recv = self.content_read
+        stats.complete = not (partial_body or self._incomplete)
+        stats.mem_after = gc.mem_free()
+        if self.debuglevel > 0:
+            print("stats:", stats)
+        if stats.hook is not None:
+            stats.hook(stats)
     
     def isclosed(self):
         return self._sock is None
@@ -360,21 +534,44 @@ class HTTPResponse:
         if len(bmv) == 0:
             return 0
         if self.chunked:
-            return self._read_chunked(bmv)
+            n = self._read_chunked(bmv)
         else:
-            return self._read_raw(bmv)
+            n = self._read_raw(bmv)
+        if self._limiter is not None and n > 0:
+            self._limiter.acquire(n, self._priority)
+        return n
     
     def read(self, amt=None):
+        if self._limiter is not None:
+            return self._read_paced(amt)
         res = self._read(amt)
         if res is None:
             return _BLANK
-        if not isinstance(res, list):
-            return res
-        if len(res) == 0:
-            return _BLANK
-        if len(res) == 1:
-            return res[0]
-        return _BLANK.join(res)
+        if isinstance(res, list):
+            if len(res) == 0:
+                return _BLANK
+            if len(res) == 1:
+                res = res[0]
+            else:
+                res = _BLANK.join(res)
+        return res
+    
+    def _read_paced(self, amt):
+        # Reads block by block through _readinto() so the limiter paces the
+        # body as it arrives rather than charging for it all afterwards.
+        if amt is not None and amt < 0:
+            amt = None
+        res = bytearray()
+        block = memoryview(bytearray(self._blocksize))
+        while amt is None or len(res) < amt:
+            if amt is None or amt - len(res) >= len(block):
+                n = self._readinto(block)
+            else:
+                n = self._readinto(block[:amt - len(res)])
+            if n == 0:
+                break
+            res.extend(block[:n])
+        return bytes(res)
     
     def _read(self, amt=None):
         # Zero-sized: return immediately without touching the socket.
@@ -654,6 +851,86 @@ class HTTPResponse:
                 break
             yield n
     
+    # Extension: yields one memoryview slice of buf per line, without the line
+    # ending. Slices are only valid until the next iteration. Lines must fit
+    # in buf. Lone CR line endings are not recognized.
+    def iter_lines_into(self, buf):
+        bmv = buf if isinstance(buf, memoryview) else memoryview(buf)
+        size = len(bmv)
+        start = end = 0
+        eof = False
+        while True:
+            nl = _find_byte(bmv, 10, start, end)
+            if nl < 0 and eof:
+                if start < end:
+                    yield bmv[start:end]
+                return
+            if nl >= 0:
+                stop = nl
+                if stop > start and bmv[stop - 1] == 13:
+                    stop -= 1
+                yield bmv[start:stop]
+                start = nl + 1
+                continue
+            if start > 0:
+                # Slide the partial line to the front of the buffer.
+                bmv[0:end - start] = bmv[start:end]
+                end -= start
+                start = 0
+            if end == size:
+                self.close(_CR_MALFORMED)
+                raise ValueError("line too long")
+            n = self._readinto(bmv[end:])
+            if n <= 0:
+                eof = True
+            else:
+                end += n
+    
+    # Extension: newline-delimited JSON; blank lines are skipped.
+    def iter_json(self, buf):
+        import json
+        for line in self.iter_lines_into(buf):
+            if _find_nonspace(line):
+                yield json.loads(bytes(line))
+    
+    # Extension: text/event-stream parser yielding ServerSentEvent objects.
+    def iter_events(self, buf, last_event_id=None):
+        event = None
+        data = []
+        retry = None
+        for line in self.iter_lines_into(buf):
+            len_line = len(line)
+            if len_line == 0:
+                if data:
+                    yield ServerSentEvent(event or "message", "\n".join(data), last_event_id, retry)
+                event = None
+                data = []
+                continue
+            if line[0] == 58:  # ':' comment / keep-alive
+                continue
+            colon = _find_byte(line, 58, 0, len_line)
+            if colon < 0:
+                field = bytes(line)
+                value = line[len_line:]
+            else:
+                field = bytes(line[:colon])
+                colon += 1
+                if colon < len_line and line[colon] == 32:
+                    colon += 1
+                value = line[colon:]
+            if field == b"data":
+                data.append(bytes(value).decode(_DECODE_BODY))
+            elif field == b"event":
+                event = bytes(value).decode(_DECODE_BODY)
+            elif field == b"id":
+                if _find_byte(value, 0, 0, len(value)) < 0:
+                    last_event_id = bytes(value).decode(_DECODE_BODY)
+            elif field == b"retry":
+                try:
+                    retry = int(bytes(value), 10)
+                except ValueError:
+                    pass
+    
     def readable(self):
         return True
 
@@ -662,6 +939,9 @@ class HTTPConnection:
     default_port = HTTP_PORT
     auto_open = True
     debuglevel = 0
+    hook = None           # Extension: callable(RequestStats), e.g. a StatsRing
+    limiter = None        # Extension: TokenBucket applied to send and receive
+    priority = PRIORITY_NORMAL
     
     # Extension
     def __enter__(self):
@@ -690,12 +970,13 @@ class HTTPConnection:
         self._filled = 0
         self._method = None
         self._url = None
+        self._stats = None
     
     def set_debuglevel(self, level):
         self.debuglevel = level
     
     def connect(self):
-        self.sock = create_connection((self.host, self.port), self.timeout)
+        self.sock = _create_connection((self.host, self.port), self.timeout, self._stats)
     
     def close(self):
         self.__state = _CS_IDLE
@@ -792,6 +1073,10 @@ class HTTPConnection:
         else:
             self._method = method.upper().decode("ascii")
         self._url = url
+        if self.hook is not None or self.debuglevel > 0:
+            self._stats = RequestStats(self._method, url, self.hook)
+        else:
+            self._stats = None
         url = _encode_and_validate(url, _ENCODE_HEAD, deny_flags=1) if url else b"/"
         
         self._putheaderparts(False, method, b" ", url, b" HTTP/1.1\r\n")
@@ -869,6 +1154,16 @@ class HTTPConnection:
         # (re)connect if an existing keep-alive socket is dead.
         if data is None:
             data = _BLANK
+        if self.limiter is not None and data:
+            # Rate-limit block by block so a large body is paced rather than sent in one burst.
+            if len(data) > self.blocksize:
+                mv = data if isinstance(data, memoryview) else memoryview(data)
+                for i in range(0, len(mv), self.blocksize):
+                    self._send_raw(mv[i:i+self.blocksize])
+                return
+            self.limiter.acquire(len(data), self.priority)
+        if self._stats is not None:
+            self._stats.bytes_sent += len(data)
         
         if self._auto_open and not self._sent_data:
             try:
@@ -971,8 +1266,17 @@ class HTTPConnection:
         if self.__state != _CS_REQ_SENT or self.__response is not None:
             raise ResponseNotReady()
         
+        stats = self._stats
+        self._stats = None
+        if stats is not None:
+            stats.t_sent = time.ticks_us()
+        
         try:
             response = HTTPResponse(self.sock, self.debuglevel, self._method, self._url)
+            response._stats = stats
+            response._limiter = self.limiter
+            response._priority = self.priority
+            response._blocksize = self.blocksize
             response.begin(**kwargs)
             self.__state = _CS_IDLE
             if response.will_close:
@@ -1041,3 +1345,5 @@ else:
                 except OSError:
                     pass
                 raise
+            if self._stats is not None:
+                self._stats.t_tls = time.ticks_us()
@@ -0,0 +1,535 @@
+# http/websocket.py
+
+# RFC 6455 client. The synchronous client performs the Upgrade through
+# http.client_ish.HTTPConnection and then takes the socket with detach().
+
+import micropython
+from micropython import const
+from urllib.parse import urlsplit
+import http.client_ish as http_client
+
+OP_CONT = const(0)
+OP_TEXT = const(1)
+OP_BINARY = const(2)
+OP_CLOSE = const(8)
+OP_PING = const(9)
+OP_PONG = const(10)
+
+CLOSE_NORMAL = const(1000)
+CLOSE_PROTOCOL_ERROR = const(1002)
+
+_GUID = const(b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11")
+
+class WebSocketError(http_client.HTTPException): pass
+
+@micropython.viper
+def _mask(buf:ptr8, buflen:int, key:ptr8, offset:int):
+    # XORs buf in place with the 4-byte key, starting at key[offset & 3].
+    i = 0
+    while i < buflen:
+        buf[i] = buf[i] ^ key[(i + offset) & 3]
+        i += 1
+
+def _random_bytes(n):
+    try:
+        import os
+        return os.urandom(n)
+    except (ImportError, AttributeError):
+        try:
+            import urandom as random
+        except ImportError:
+            import random
+        return bytes(random.getrandbits(8) for _ in range(n))
+
+def _make_key():
+    import binascii
+    return binascii.b2a_base64(_random_bytes(16)).strip()
+
+def _check_accept(key, accept):
+    # Skipped on ports built without SHA-1.
+    try:
+        import hashlib, binascii
+        sha1 = hashlib.sha1
+    except (ImportError, AttributeError):
+        return
+    expected = binascii.b2a_base64(sha1(key + _GUID).digest()).strip()
+    if accept is None or accept.strip() != expected:
+        raise WebSocketError("bad Sec-WebSocket-Accept")
+
+def _handshake_headers(key, headers, subprotocols):
+    req_headers = {
+        "Upgrade": "websocket",
+        "Connection": "Upgrade",
+        "Sec-WebSocket-Key": key,
+        "Sec-WebSocket-Version": "13",
+    }
+    if subprotocols:
+        req_headers["Sec-WebSocket-Protocol"] = ", ".join(subprotocols)
+    if headers:
+        req_headers.update(headers)
+    return req_headers
+
+def _check_handshake(status, getheader, key):
+    if status != 101:
+        raise WebSocketError("handshake failed: %d" % (status,))
+    if b"websocket" not in getheader(b"upgrade", b"").lower():
+        raise WebSocketError("missing Upgrade: websocket")
+    _check_accept(key, getheader(b"sec-websocket-accept", None))
+    protocol = getheader(b"sec-websocket-protocol", None)
+    return None if protocol is None else protocol.decode()
+
+def _split_url(url):
+    p = urlsplit(url)
+    if p.scheme == "wss":
+        secure = True
+    elif p.scheme == "ws":
+        secure = False
+    else:
+        raise ValueError("unsupported scheme")
+    path = p.path or "/"
+    if p.query:
+        path += "?" + p.query
+    return p.hostname, p.port, path, secure
+
+def _pack_header(hdr, opcode, n, fin, mask):
+    # Client frames are always masked. Returns the header length.
+    hdr[0] = (0x80 if fin else 0) | opcode
+    if n < 126:
+        hdr[1] = 0x80 | n
+        i = 2
+    elif n < 65536:
+        hdr[1] = 0x80 | 126
+        hdr[2] = n >> 8
+        hdr[3] = n & 0xFF
+        i = 4
+    else:
+        hdr[1] = 0x80 | 127
+        for k in range(8):
+            hdr[2 + k] = (n >> (56 - 8 * k)) & 0xFF
+        i = 10
+    hdr[i:i + 4] = mask
+    return i + 4
+
+def _new_mask(mask):
+    mask[0:4] = _random_bytes(4)
+
+def _close_payload(code, reason):
+    if code is None:
+        return b""
+    if isinstance(reason, str):
+        reason = reason.encode("utf-8")
+    return bytes((code >> 8, code & 0xFF)) + reason[:123]
+
+
+def _run_sync(coro):
+    # Runs one of the _FrameState coroutines for WebSocket, whose I/O primitives block
+    # instead of suspending, so the coroutine finishes on its first step.
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("WebSocket I/O suspended")
+
+
+class _FrameState:
+    # Framing and the receive/close state machine, shared by WebSocket and AsyncWebSocket.
+    # The protocol is written once as coroutines over the I/O primitives _readinto(mv),
+    # _write(mv) and _close_transport(), which each subclass provides.
+    
+    def __init__(self, blocksize):
+        if blocksize < 16:
+            raise ValueError("blocksize too small")
+        self.blocksize = blocksize
+        self._sbuf = bytearray(blocksize)
+        self._smv = memoryview(self._sbuf)
+        self._hdr = bytearray(14)   # header of the frame being sent
+        self._hmv = memoryview(self._hdr)
+        self._smask = bytearray(4)
+        self._rhdr = bytearray(8)   # header of the frame being received
+        self._rhmv = memoryview(self._rhdr)
+        self._rmask = bytearray(4)
+        self._cbuf = bytearray(125)  # control frame payloads
+        self._cmv = memoryview(self._cbuf)
+        self._left = 0       # unread payload bytes of the current data frame
+        self._fin = True     # False while a fragmented message is open
+        self._rmasked = False
+        self._rpos = 0
+        self.opcode = None   # OP_TEXT or OP_BINARY of the message being received
+        self.done = True     # last recv_into() finished a message
+        self.closed = False
+        self._closing = False  # we sent a close frame and await the peer's
+        self.close_code = None
+        self.protocol = None
+    
+    def _decode_length(self, n):
+        hdr = self._rhdr
+        if n == 126:
+            return (hdr[0] << 8) | hdr[1]
+        val = 0
+        for k in range(8):
+            val = (val << 8) | hdr[k]
+        return val
+    
+    def _prepare_chunk(self, data, pos, n, opcode, fin):
+        # Copies the next piece of payload into _sbuf and masks it.
+        # Returns (bytes in _sbuf, payload bytes consumed).
+        smv = self._smv
+        if pos == 0:
+            _new_mask(self._smask)
+            h = _pack_header(self._hdr, opcode, n, fin, self._smask)
+            smv[0:h] = self._hmv[0:h]
+        else:
+            h = 0
+        k = n - pos
+        if k > self.blocksize - h:
+            k = self.blocksize - h
+        if k:
+            smv[h:h + k] = data[pos:pos + k]
+            _mask(smv[h:], k, self._smask, pos)
+        return h + k, k
+    
+    def _start_frame(self):
+        # Interprets _rhdr[0:2]; returns (opcode, fin, length code).
+        b0 = self._rhdr[0]
+        b1 = self._rhdr[1]
+        if b0 & 0x70:
+            raise WebSocketError("reserved bits set")
+        self._rmasked = bool(b1 & 0x80)
+        return b0 & 0x0F, bool(b0 & 0x80), b1 & 0x7F
+    
+    def _unmask_payload(self, mv, n):
+        if self._rmasked:
+            _mask(mv, n, self._rmask, self._rpos)
+            self._rpos += n
+    
+    async def _readexactly(self, mv):
+        total = 0
+        n = len(mv)
+        while total < n:
+            got = await self._readinto(mv[total:] if total else mv)
+            if not got:
+                raise WebSocketError("connection closed")
+            total += got
+    
+    async def _send_frame(self, opcode, data=b"", fin=True):
+        await self._write_frame(opcode, data, fin)
+    
+    async def _write_frame(self, opcode, data, fin):
+        # Writes one frame through _sbuf in blocksize chunks.
+        if self.closed:
+            raise WebSocketError("connection closed")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if not isinstance(data, memoryview):
+            data = memoryview(data)
+        n = len(data)
+        pos = 0
+        while True:
+            size, k = self._prepare_chunk(data, pos, n, opcode, fin)
+            await self._write(self._smv[:size])
+            pos += k
+            if pos >= n:
+                break
+    
+    async def _next_data_frame(self):
+        # Handles control frames inline; returns False once closed.
+        while not self.closed:
+            await self._readexactly(self._rhmv[0:2])
+            opcode, fin, n = self._start_frame()
+            if n == 126:
+                await self._readexactly(self._rhmv[0:2])
+                n = self._decode_length(n)
+            elif n == 127:
+                await self._readexactly(self._rhmv[0:8])
+                n = self._decode_length(n)
+            if self._rmasked:
+                await self._readexactly(memoryview(self._rmask))
+            self._rpos = 0
+            
+            if opcode >= OP_CLOSE:
+                if n > 125 or not fin:
+                    await self._fail(CLOSE_PROTOCOL_ERROR)
+                    return False
+                payload = self._cmv[:n]
+                if n:
+                    await self._readexactly(payload)
+                    self._unmask_payload(payload, n)
+                if opcode == OP_PING:
+                    await self._send_frame(OP_PONG, payload)
+                elif opcode == OP_CLOSE:
+                    self.close_code = (payload[0] << 8) | payload[1] if n >= 2 else None
+                    await self._finish_close(self.close_code)
+                    return False
+                continue
+            
+            if opcode == OP_CONT:
+                if self._fin:
+                    await self._fail(CLOSE_PROTOCOL_ERROR)
+                    return False
+            elif opcode == OP_TEXT or opcode == OP_BINARY:
+                if not self._fin:
+                    # A new message may not start inside a fragmented one (RFC 6455 5.4)
+                    await self._fail(CLOSE_PROTOCOL_ERROR)
+                    return False
+                self.opcode = opcode
+            else:
+                await self._fail(CLOSE_PROTOCOL_ERROR)
+                return False
+            self._left = n
+            self._fin = fin
+            return True
+        return False
+    
+    async def _recv_into(self, buf):
+        # Fills buf with the next part of the current message and returns the
+        # byte count; self.done is True when the message is complete. Returns
+        # 0 with self.closed set once the peer has closed the connection.
+        bmv = buf if isinstance(buf, memoryview) else memoryview(buf)
+        size = len(bmv)
+        total = 0
+        if self._left == 0:
+            if not await self._next_data_frame():
+                self.done = True
+                return 0
+        while total < size:
+            if self._left == 0:
+                if self._fin or not await self._next_data_frame():
+                    break
+                continue
+            k = self._left
+            if k > size - total:
+                k = size - total
+            piece = bmv[total:total + k]
+            await self._readexactly(piece)
+            self._unmask_payload(piece, k)
+            self._left -= k
+            total += k
+        self.done = (self._left == 0 and self._fin)
+        return total
+    
+    async def _recv(self):
+        # Whole message as str (text) or bytes (binary), or None once closed.
+        res = bytearray()
+        chunk = memoryview(bytearray(self.blocksize))
+        while True:
+            n = await self._recv_into(chunk)
+            if self.closed:
+                return None
+            res.extend(chunk[:n])
+            if self.done:
+                break
+        if self.opcode == OP_TEXT:
+            return res.decode("utf-8")
+        return bytes(res)
+    
+    async def _finish_close(self, code):
+        # Echo the peer's close (if we did not start it) and drop the connection.
+        if not self._closing:
+            try:
+                await self._send_frame(OP_CLOSE, _close_payload(code, b""))
+            except (OSError, WebSocketError):
+                pass
+        await self._shutdown()
+    
+    async def _fail(self, code):
+        self.close_code = code
+        await self._finish_close(code)
+    
+    async def _shutdown(self):
+        self.closed = True
+        self._left = 0
+        self._fin = True
+        await self._close_transport()
+    
+    async def _close(self, code=CLOSE_NORMAL, reason=b""):
+        if self.closed:
+            return
+        try:
+            await self._send_frame(OP_CLOSE, _close_payload(code, reason))
+            self._closing = True
+            # Wait for the peer's close frame, discarding any data.
+            scratch = self._cmv
+            while await self._next_data_frame():
+                while self._left:
+                    k = min(self._left, len(scratch))
+                    await self._readexactly(scratch[:k])
+                    self._left -= k
+        except (OSError, WebSocketError):
+            pass
+        await self._shutdown()
+
+
+class WebSocket(_FrameState):
+    
+    def __init__(self, sock, blocksize=256):
+        super().__init__(blocksize)
+        self._sock = sock
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+    
+    # Blocking I/O primitives, see _run_sync()
+    
+    async def _readinto(self, mv):
+        return self._sock.readinto(mv)
+    
+    async def _write(self, mv):
+        self._sock.sendall(mv)
+    
+    async def _close_transport(self):
+        sock = self._sock
+        self._sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+    
+    def send_frame(self, opcode, data=b"", fin=True):
+        _run_sync(self._send_frame(opcode, data, fin))
+    
+    def send(self, data):
+        self.send_frame(OP_TEXT if isinstance(data, str) else OP_BINARY, data)
+    
+    def ping(self, data=b""):
+        self.send_frame(OP_PING, data)
+    
+    def recv_into(self, buf):
+        return _run_sync(self._recv_into(buf))
+    
+    def recv(self):
+        return _run_sync(self._recv())
+    
+    def close(self, code=CLOSE_NORMAL, reason=b""):
+        _run_sync(self._close(code, reason))
+
+
+def connect(url, headers=None, *, timeout=None, subprotocols=None, blocksize=256, **kwargs):
+    host, port, path, secure = _split_url(url)
+    if secure:
+        connection_class = http_client.HTTPSConnection
+    else:
+        connection_class = http_client.HTTPConnection
+    connection = connection_class(host, port=port, timeout=timeout, **kwargs)
+    key = _make_key()
+    try:
+        connection.request("GET", path, headers=_handshake_headers(key, headers, subprotocols))
+        response = connection.getresponse()
+        protocol = _check_handshake(response.status, response.getheader, key)
+        sock = connection.detach()
+    except Exception:
+        connection.close()
+        raise
+    ws = WebSocket(sock, blocksize)
+    ws.protocol = protocol
+    return ws
+
+
+class AsyncWebSocket(_FrameState):
+    
+    def __init__(self, stream, blocksize=256):
+        import asyncio
+        super().__init__(blocksize)
+        self._stream = stream
+        self._send_lock = asyncio.Lock()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        return False
+    
+    async def _readinto(self, mv):
+        return await self._stream.readinto(mv)
+    
+    async def _write(self, mv):
+        self._stream.write(mv)
+        await self._stream.drain()
+    
+    async def _close_transport(self):
+        stream = self._stream
+        self._stream = None
+        if stream is not None:
+            try:
+                stream.close()
+                await stream.wait_closed()
+            except OSError:
+                pass
+    
+    async def _send_frame(self, opcode, data=b"", fin=True):
+        # Held for the whole frame, so a concurrent send, or the PONG sent while
+        # receiving, can't interleave chunks or reuse _sbuf and _smask mid-frame.
+        async with self._send_lock:
+            await self._write_frame(opcode, data, fin)
+    
+    send_frame = _send_frame
+    recv_into = _FrameState._recv_into
+    recv = _FrameState._recv
+    close = _FrameState._close
+    
+    async def send(self, data):
+        await self._send_frame(OP_TEXT if isinstance(data, str) else OP_BINARY, data)
+    
+    async def ping(self, data=b""):
+        await self._send_frame(OP_PING, data)
+
+
+async def connect_async(url, headers=None, *, subprotocols=None, blocksize=256, ssl=None):
+    import asyncio
+    host, port, path, secure = _split_url(url)
+    default_port = http_client.HTTPS_PORT if secure else http_client.HTTP_PORT
+    if port is None:
+        port = default_port
+    if secure and ssl is None:
+        ssl = True
+    reader, writer = await asyncio.open_connection(host, port, ssl=ssl if secure else None)
+    key = _make_key()
+    try:
+        if ':' in host:
+            host = "[%s]" % (host,)
+        if port != default_port:
+            host = "%s:%d" % (host, port)
+        writer.write(b"GET " + path.encode() + b" HTTP/1.1\r\nHost: " + host.encode() + b"\r\n")
+        for k, v in _handshake_headers(key, headers, subprotocols).items():
+            if isinstance(k, str):
+                k = k.encode()
+            if isinstance(v, str):
+                v = v.encode()
+            writer.write(k + b": " + v + b"\r\n")
+        writer.write(b"\r\n")
+        await writer.drain()
+        
+        line = await reader.readline()
+        parts = line.split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith(b"HTTP/1."):
+            raise http_client.BadStatusLine()
+        status = int(parts[1], 10)
+        resp_headers = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise http_client.RemoteDisconnected()
+            if line == b"\r\n" or line == b"\n":
+                break
+            sep = line.find(b":")
+            if sep > 0:
+                resp_headers.append((http_client._normalize_key(line[:sep]), line[sep + 1:].strip()))
+        
+        def getheader(name, default=None):
+            for k, v in resp_headers:
+                if k == name:
+                    return v
+            return default
+        
+        protocol = _check_handshake(status, getheader, key)
+    except Exception:
+        writer.close()
+        raise
+    ws = AsyncWebSocket(reader, blocksize)
+    ws.protocol = protocol
+    return ws
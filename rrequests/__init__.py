@@ -1,8 +1,18 @@
 # rrequests/__init__.py
 
 import json as json_lib
-from urllib.parse import urlsplit, urljoin, urlencode
+import time
+from urllib.parse import urlsplit, urljoin, urlencode, urlencode_into, urlencoded_length
 import http.client_ish as http_client
+from http.client_ish import PRIORITY_URGENT, PRIORITY_NORMAL
+
+try:
+    from _thread import allocate_lock as _allocate_lock
+except ImportError:
+    _allocate_lock = None
+
+# The session's form buffer is not kept above this size after a request.
+_FORM_BUF_KEEP = const(1024)
 
 # --- Exceptions ---
 
@@ -14,6 +24,41 @@ class TooManyRedirects(RequestException): pass
 
 # --- Helper Functions ---
 
+HOOKS = ("response", "stats")
+
+def _merge_hooks(session_hooks, request_hooks):
+    if not request_hooks:
+        return session_hooks
+    if not session_hooks:
+        return request_hooks
+    merged = {}
+    for key in HOOKS:
+        hooks = []
+        for source in (session_hooks, request_hooks):
+            h = source.get(key)
+            if callable(h):
+                hooks.append(h)
+            elif h:
+                hooks.extend(h)
+        if hooks:
+            merged[key] = hooks
+    return merged
+
+def _dispatch_hook(hooks, key, data):
+    """
+    Calls each hook registered under key with data.
+    A hook returning something other than None replaces data for the next one.
+    """
+    hooks = hooks.get(key) if hooks else None
+    if hooks:
+        if callable(hooks):
+            hooks = (hooks,)
+        for hook in hooks:
+            result = hook(data)
+            if result is not None:
+                data = result
+    return data
+
 def _encode_files(files, data):
     """
     Multipart-encoded file uploader.
@@ -203,15 +248,51 @@ class Response:
                 yield chunk
         finally:
             self.close()
+    
+    # Newline-delimited JSON; needs stream=True. buf bounds the longest line.
+    def iter_json(self, buf=None, chunk_size=512):
+        if self._response is None:
+            return
+        if buf is None:
+            buf = bytearray(chunk_size)
+        try:
+            yield from self._response.iter_json(buf)
+        finally:
+            self.close()
+    
+    # text/event-stream; needs stream=True. buf bounds the longest line.
+    def iter_events(self, buf=None, chunk_size=512, last_event_id=None):
+        if self._response is None:
+            return
+        if buf is None:
+            buf = bytearray(chunk_size)
+        try:
+            yield from self._response.iter_events(buf, last_event_id)
+        finally:
+            self.close()
 
 
 
 class Session:
     
-    def __init__(self, connect_to_wifi=None, wifi_params=None):
+    def __init__(self, connect_to_wifi=None, wifi_params=None, hooks=None, rate_limit=None, host_rate_limit=None):
         self.connect_to_wifi = connect_to_wifi
         self.wifi_params = wifi_params
         
+        # Bytes/second, shared by all requests and by all requests to one host.
+        self.limiter = http_client.TokenBucket(rate_limit) if rate_limit else None
+        self.host_rate_limit = host_rate_limit
+        self._host_limiters = {}
+        
+        # Form bodies are encoded into this buffer while no other request is
+        # sending from it (e.g. one made from a hook, or by another thread).
+        self._form_buf = bytearray()
+        self._form_lock = _allocate_lock() if _allocate_lock is not None else None
+        self._form_busy = False
+        
+        # {"response": [fn(Response)], "stats": [fn(http_client.RequestStats)]}
+        self.hooks = hooks if hooks is not None else {}
+        
         self.headers = {}
         self.cookies = {}
         self.auth = None
@@ -225,6 +306,33 @@ class Session:
     def __exit__(self, *args):
         pass
     
+    def _take_form_buf(self):
+        # The session's form buffer, or None while another request holds it.
+        if self._form_lock is not None:
+            if not self._form_lock.acquire(0):
+                return None
+        elif self._form_busy:
+            return None
+        self._form_busy = True
+        return self._form_buf
+    
+    def _release_form_buf(self):
+        if len(self._form_buf) > _FORM_BUF_KEEP:
+            self._form_buf = bytearray()
+        self._form_busy = False
+        if self._form_lock is not None:
+            self._form_lock.release()
+    
+    def _get_limiter(self, host, port):
+        if not self.host_rate_limit:
+            return self.limiter
+        key = (host, port)
+        limiter = self._host_limiters.get(key)
+        if limiter is None:
+            limiter = http_client.TokenBucket(self.host_rate_limit, parent=self.limiter)
+            self._host_limiters[key] = limiter
+        return limiter
+    
     def _request(self, method, url, 
                  params=None, 
                  data=None, 
@@ -241,7 +349,8 @@ class Session:
                  cert=None, 
                  json=None,
                  extra_headers=True,
-                 parse_cookies=True
+                 parse_cookies=True,
+                 priority=None
             ):
         
         req_headers = self.headers.copy()
@@ -249,6 +358,11 @@ class Session:
             req_headers.update(headers)
         
         req_auth = auth if auth is not None else self.auth
+        req_hooks = _merge_hooks(self.hooks, hooks)
+        if req_hooks and req_hooks.get("stats"):
+            stats_hook = lambda stats: _dispatch_hook(req_hooks, "stats", stats)
+        else:
+            stats_hook = None
         
         if params:
             qs = urlencode(params)
@@ -257,105 +371,127 @@ class Session:
             else:
                 url += "?" + qs
         
-        body = None
-        if json is not None:
-            body = json_lib.dumps(json)
-            req_headers["Content-Type"] = "application/json"
-        elif files:
-            content_type, body = _encode_files(files, data)
-            req_headers["Content-Type"] = content_type
-        elif data:
-            if isinstance(data, dict):
-                body = urlencode(data)
-                req_headers["Content-Type"] = "application/x-www-form-urlencoded"
-            else:
-                body = data
-        
-        if callable(req_auth):
-            req_headers.update(req_auth())
-        elif isinstance(req_auth, tuple):
-            import ubinascii
-            token = ubinascii.b2a_base64(":".join(req_auth).encode("utf-8")).strip()
-            req_headers["Authorization"] = b"Basic " + token
-        
-        history = []
-        _redirects = 0
-        
-        q = urlsplit(url)
-        while True:
-            p = q
-            
-            scheme = p.scheme
-            host = p.hostname
-            port = p.port
-            path = p.path or "/"
-            if p.query:
-                path += "?" + p.query
+        form_buf = None
+        try:
+            body = None
+            if json is not None:
+                body = json_lib.dumps(json)
+                req_headers["Content-Type"] = "application/json"
+            elif files:
+                content_type, body = _encode_files(files, data)
+                req_headers["Content-Type"] = content_type
+            elif data:
+                if isinstance(data, dict):
+                    form_buf = self._take_form_buf()
+                    if form_buf is None:
+                        buf = bytearray(urlencoded_length(data))
+                    else:
+                        buf = form_buf
+                    # Taken after encoding, since the buffer may be reallocated as it grows.
+                    n = urlencode_into(data, buf)
+                    body = memoryview(buf)[:n]
+                    req_headers["Content-Type"] = "application/x-www-form-urlencoded"
+                else:
+                    body = data
             
-            if scheme == "https":
-                connection_class = http_client.HTTPSConnection
-            else:
-                connection_class = http_client.HTTPConnection
+            if callable(req_auth):
+                req_headers.update(req_auth())
+            elif isinstance(req_auth, tuple):
+                import ubinascii
+                token = ubinascii.b2a_base64(":".join(req_auth).encode("utf-8")).strip()
+                req_headers["Authorization"] = b"Basic " + token
             
-            req_cookies = self.cookies.copy()
-            if cookies:
-                req_cookies.update(cookies)
+            history = []
+            _redirects = 0
             
-            connection = None
-            try:
-                connection = connection_class(host, port=port, timeout=timeout)
-                connection.request(method.upper(), path, body=body, headers=req_headers, cookies=req_cookies)
+            q = urlsplit(url)
+            while True:
+                p = q
                 
-                raw_response = connection.getresponse(extra_headers=extra_headers, parse_cookies=parse_cookies)
+                scheme = p.scheme
+                host = p.hostname
+                port = p.port
+                path = p.path or "/"
+                if p.query:
+                    path += "?" + p.query
                 
-                response = Response(connection, raw_response, stream=stream)
-                response.url = url
-                connection = None  # Response owns it now
+                if scheme == "https":
+                    connection_class = http_client.HTTPSConnection
+                else:
+                    connection_class = http_client.HTTPConnection
                 
-                if response.cookies:
-                    self.cookies.update(response.cookies)
+                req_cookies = self.cookies.copy()
+                if cookies:
+                    req_cookies.update(cookies)
                 
-                if allow_redirects and response.status_code in [301, 302, 303, 307, 308]:
-                    if _redirects >= self.max_redirects:
-                        raise TooManyRedirects()
-                    
-                    history.append(response)
-                    _redirects += 1
+                connection = None
+                try:
+                    connection = connection_class(host, port=port, timeout=timeout)
+                    if stats_hook is not None:
+                        connection.hook = stats_hook
+                    limiter = self._get_limiter(host, port)
+                    if limiter is not None:
+                        connection.limiter = limiter
+                    if priority is not None:
+                        connection.priority = priority
+                    connection.request(method.upper(), path, body=body, headers=req_headers, cookies=req_cookies)
                     
-                    response.close() 
+                    raw_response = connection.getresponse(extra_headers=extra_headers, parse_cookies=parse_cookies)
                     
-                    location = response.headers.get("location")
-                    if not location:
-                        response.history = history
-                        return response
+                    response = Response(connection, raw_response, stream=stream)
+                    response.url = url
+                    connection = None  # Response owns it now
                     
-                    url = urljoin(url, location)
+                    if req_hooks:
+                        response = _dispatch_hook(req_hooks, "response", response)
                     
-                    q = urlsplit(url)
-                    if p.hostname != q.hostname or p.port != q.port:
-                        for key in list(req_headers.keys()):
-                            if key.lower() in ["authorization"]:
-                                del req_headers[key]
+                    if response.cookies:
+                        self.cookies.update(response.cookies)
                     
-                    if resp.status_code in [301, 302, 303]:
-                        for key in list(req_headers.keys()):
-                            if key.lower() in ["content-type", "content-length", "transfer-encoding"]:
-                                del req_headers[key]
-                        if resp.status_code == 303 or method.upper() == "POST":
-                            method = "GET"
-                        body = None
+                    if allow_redirects and response.status_code in [301, 302, 303, 307, 308]:
+                        if _redirects >= self.max_redirects:
+                            raise TooManyRedirects()
+                        
+                        history.append(response)
+                        _redirects += 1
+                        
+                        response.close() 
+                        
+                        location = response.headers.get("location")
+                        if not location:
+                            response.history = history
+                            return response
+                        
+                        url = urljoin(url, location)
+                        
+                        q = urlsplit(url)
+                        if p.hostname != q.hostname or p.port != q.port:
+                            for key in list(req_headers.keys()):
+                                if key.lower() in ["authorization"]:
+                                    del req_headers[key]
+                        
+                        if resp.status_code in [301, 302, 303]:
+                            for key in list(req_headers.keys()):
+                                if key.lower() in ["content-type", "content-length", "transfer-encoding"]:
+                                    del req_headers[key]
+                            if resp.status_code == 303 or method.upper() == "POST":
+                                method = "GET"
+                            body = None
+                        
+                        continue
                     
-                    continue
+                    response.history = history
+                    return response
                 
-                response.history = history
-                return response
-            
-            except OSError as e:
-                raise ConnectionError(e)
-            
-            finally:
-                if connection is not None:
-                    connection.close()
+                except OSError as e:
+                    raise ConnectionError(e)
+                
+                finally:
+                    if connection is not None:
+                        connection.close()
+        finally:
+            if form_buf is not None:
+                self._release_form_buf()
     
     def request(self, method, url, **kwargs):
         try:
@@ -404,6 +540,47 @@ class Session:
     
     def delete(self, url, **kwargs):
         return self.request("DELETE", url, **kwargs)
+    
+    def iter_events(self, url, *, last_event_id=None, retry_ms=3000, max_reconnects=None, buf=None, chunk_size=512, **kwargs):
+        """
+        Consumes a Server-Sent Events stream, reconnecting with Last-Event-ID
+        whenever the connection drops or the server answers 5xx. A 204
+        response ends the stream; a 4xx raises HTTPError.
+        """
+        if buf is None:
+            buf = bytearray(chunk_size)
+        headers = {"Accept": "text/event-stream", "Cache-Control": "no-cache"}
+        headers.update(kwargs.pop("headers", None) or {})
+        reconnects = 0
+        while True:
+            if last_event_id:
+                headers["Last-Event-ID"] = last_event_id
+            try:
+                response = self.get(url, stream=True, headers=headers, **kwargs)
+            except (ConnectionError, Timeout, http_client.HTTPException):
+                # e.g. NotConnected when the link is down
+                response = None
+            if response is not None:
+                try:
+                    if response.status_code == 204:
+                        return
+                    # A 5xx is treated like a dropped connection; 4xx won't get better.
+                    if response.status_code < 500:
+                        response.raise_for_status()
+                        for event in response.iter_events(buf, last_event_id=last_event_id):
+                            reconnects = 0
+                            last_event_id = event.id
+                            if event.retry is not None:
+                                retry_ms = event.retry
+                            yield event
+                except (OSError, http_client.HTTPException):
+                    pass
+                finally:
+                    response.close()
+            if max_reconnects is not None and reconnects >= max_reconnects:
+                raise ConnectionError("event stream lost")
+            reconnects += 1
+            time.sleep_ms(retry_ms)
 
 # --- Module Level API ---
 
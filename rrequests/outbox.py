@@ -0,0 +1,291 @@
+# rrequests/outbox.py
+
+# Store-and-forward queue for requests made while the link is down.
+#
+# Records are appended to a log file on flash:
+#     b"<body length> <method> <url> <content type or ->\n" + body + b"\n"
+# The offset of the first undelivered record lives in a separate file that is
+# replaced atomically (write .tmp, rename), and only after the server accepts
+# a record, so delivery is at-least-once: a crash may resend, never lose.
+
+import os
+import json as json_lib
+from urllib.parse import urlsplit
+import http.client_ish as http_client
+
+from . import ConnectionError
+
+_BLANK = const(b"")
+_NO_TYPE = const(b"-")
+_JSON_TYPE = const(b"application/json")
+
+def _sync():
+    if hasattr(os, "sync"):
+        try:
+            os.sync()
+        except OSError:
+            pass
+
+def _filesize(filename):
+    try:
+        return os.stat(filename)[6]
+    except OSError:
+        return 0
+
+def _to_bytes(s):
+    if isinstance(s, str):
+        return s.encode("utf-8")
+    return bytes(s)
+
+
+class Outbox:
+    
+    def __init__(self, filename, *, max_size=16384, headers=None, timeout=None, coalesce=False, batch_size=1024):
+        self._filename = filename
+        self._offname = filename + ".off"
+        self.max_size = max_size
+        self.headers = headers if headers is not None else {}
+        self.timeout = timeout
+        # Merge consecutive application/json records for the same URL into one
+        # JSON array body of up to batch_size bytes.
+        self.coalesce = coalesce
+        self.batch_size = batch_size
+        
+        self._offset = self._load_offset()
+        self._size = _filesize(filename)
+        if self._offset > self._size:
+            self._offset = 0
+        self._count = 0
+        self._recover()
+    
+    def __len__(self):
+        return self._count
+    
+    # Persistence
+    
+    def _load_offset(self):
+        try:
+            with open(self._offname, "rb") as fh:
+                return int(fh.read().strip() or b"0", 10)
+        except (OSError, ValueError):
+            return 0
+    
+    def _commit_offset(self, offset):
+        tempfile = self._offname + ".tmp"
+        with open(tempfile, "wb") as fh:
+            fh.write(b"%d" % (offset,))
+        os.rename(tempfile, self._offname)
+        _sync()
+        self._offset = offset
+    
+    def _read_record(self, fh):
+        # Returns (method, url, content_type, body) or None at EOF/torn tail.
+        line = fh.readline()
+        if not line or not line.endswith(b"\n"):
+            return None
+        parts = line.split()
+        if len(parts) != 4:
+            return None
+        try:
+            length = int(parts[0], 10)
+        except ValueError:
+            return None
+        body = fh.read(length + 1)
+        if len(body) != length + 1 or body[-1] != 10:
+            return None
+        content_type = None if parts[3] == _NO_TYPE else parts[3]
+        return parts[1], parts[2], content_type, body[:-1]
+    
+    def _recover(self):
+        # Count pending records; rewrite the log if it ends in a torn record.
+        good = self._offset
+        try:
+            with open(self._filename, "rb") as fh:
+                fh.seek(self._offset)
+                while self._read_record(fh) is not None:
+                    good = fh.tell()
+                    self._count += 1
+        except OSError:
+            return
+        if good != self._size:
+            self._compact(good)
+    
+    def _compact(self, end=None):
+        # Copy [offset:end] to a fresh log. The offset is reset before the
+        # rename, so a crash in between can only cause redelivery.
+        if end is None:
+            end = self._size
+        start = self._offset
+        tempfile = self._filename + ".tmp"
+        with open(self._filename, "rb") as src, open(tempfile, "wb") as dst:
+            src.seek(start)
+            remaining = end - start
+            buf = bytearray(256)
+            mv = memoryview(buf)
+            while remaining > 0:
+                n = src.readinto(mv[:min(remaining, len(buf))])
+                if not n:
+                    break
+                dst.write(mv[:n])
+                remaining -= n
+        self._commit_offset(0)
+        os.rename(tempfile, self._filename)
+        _sync()
+        self._size = end - start if end > start else 0
+    
+    def _drop_oldest(self):
+        with open(self._filename, "rb") as fh:
+            fh.seek(self._offset)
+            if self._read_record(fh) is None:
+                return False
+            offset = fh.tell()
+        self._commit_offset(offset)
+        self._count -= 1
+        return True
+    
+    def _reset(self):
+        for filename in (self._filename, self._offname):
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+        self._offset = self._size = self._count = 0
+    
+    # Queueing
+    
+    def append(self, method, url, body=None, content_type=None):
+        """
+        Queues a request. Returns False if it can never fit in max_size.
+        The oldest records are dropped to make room for new ones.
+        """
+        body = _BLANK if body is None else _to_bytes(body)
+        fields = (b"%d" % (len(body),), _to_bytes(method).upper(), _to_bytes(url),
+                  _NO_TYPE if content_type is None else _to_bytes(content_type))
+        header = b" ".join(fields) + b"\n"
+        if len(header.split()) != 4:
+            raise ValueError("method, url and content type can't contain whitespace")
+        reclen = len(header) + len(body) + 1
+        if reclen > self.max_size:
+            return False
+        
+        while self._size + reclen > self.max_size:
+            if self._offset > 0:
+                self._compact()
+            elif not self._drop_oldest():
+                self._reset()
+        
+        with open(self._filename, "ab") as fh:
+            fh.write(header)
+            fh.write(body)
+            fh.write(b"\n")
+            fh.flush()
+        _sync()
+        self._size += reclen
+        self._count += 1
+        return True
+    
+    def post(self, url, data=None, json=None, session=None):
+        """
+        Sends immediately when the queue is empty and the link is up;
+        otherwise queues the request. Returns the Response, or None if queued.
+        """
+        if json is not None:
+            body, content_type = json_lib.dumps(json), _JSON_TYPE
+        else:
+            body, content_type = data, None
+        if session is not None and self._count == 0:
+            headers = self.headers
+            if content_type is not None:
+                headers = headers.copy()
+                headers["Content-Type"] = content_type
+            try:
+                return session.post(url, data=body, headers=headers, timeout=self.timeout)
+            except (ConnectionError, OSError, http_client.HTTPException):
+                # e.g. NotConnected when the link is down
+                pass
+        self.append("POST", url, body, content_type)
+        return None
+    
+    # Delivery
+    
+    def _batches(self, fh):
+        # Yields (method, url, content_type, body, end_offset, nrecords).
+        pending = self._read_record(fh)
+        while pending is not None:
+            method, url, content_type, body = pending
+            end = fh.tell()
+            pending = self._read_record(fh)
+            if not (self.coalesce and content_type == _JSON_TYPE and method == b"POST"):
+                yield method, url, content_type, body, end, 1
+                continue
+            parts = [body]
+            size = len(body) + 2
+            while (pending is not None and pending[1] == url and pending[0] == method
+                   and pending[2] == content_type and size + len(pending[3]) + 1 <= self.batch_size):
+                parts.append(pending[3])
+                size += len(pending[3]) + 1
+                end = fh.tell()
+                pending = self._read_record(fh)
+            if len(parts) > 1:
+                body = b"[" + b",".join(parts) + b"]"
+            yield method, url, content_type, body, end, len(parts)
+    
+    def drain(self, max_requests=None):
+        """
+        Delivers queued requests over one keep-alive connection per host.
+        Stops at the first connection error or 5xx/408/429 response.
+        Returns the number of records delivered.
+        """
+        if self._count == 0:
+            return 0
+        delivered = 0
+        requests = 0
+        connection = None
+        conn_key = None
+        try:
+            with open(self._filename, "rb") as fh:
+                fh.seek(self._offset)
+                for method, url, content_type, body, end, nrecords in self._batches(fh):
+                    if max_requests is not None and requests >= max_requests:
+                        break
+                    p = urlsplit(url.decode("utf-8"))
+                    key = (p.scheme, p.hostname, p.port)
+                    if key != conn_key:
+                        if connection is not None:
+                            connection.close()
+                        if p.scheme == "https":
+                            connection_class = http_client.HTTPSConnection
+                        else:
+                            connection_class = http_client.HTTPConnection
+                        connection = connection_class(p.hostname, port=p.port, timeout=self.timeout)
+                        conn_key = key
+                    
+                    headers = self.headers
+                    if content_type is not None:
+                        headers = headers.copy()
+                        headers["Content-Type"] = content_type
+                    path = p.path or "/"
+                    if p.query:
+                        path += "?" + p.query
+                    
+                    connection.request(method, path, body=body, headers=headers)
+                    response = connection.getresponse(extra_headers=False)
+                    response.read()
+                    response.close()
+                    requests += 1
+                    status = response.status
+                    if status >= 500 or status == 408 or status == 429:
+                        break
+                    
+                    self._commit_offset(end)
+                    self._count -= nrecords
+                    delivered += nrecords
+        except (OSError, http_client.HTTPException):
+            pass
+        finally:
+            if connection is not None:
+                connection.close()
+        
+        if self._count == 0:
+            self._reset()
+        return delivered
@@ -0,0 +1,65 @@
+# tests/test_outbox.py
+#
+# Queueing behaviour of rrequests.outbox. Run on the unix port from the repo root:
+#     micropython tests/test_outbox.py
+
+import sys
+sys.path.insert(0, "")
+
+import os
+import unittest
+import http.client_ish as http_client
+from rrequests.outbox import Outbox
+
+FILENAME = "test_outbox.log"
+
+
+class DirectSession:
+    # The part of rrequests.Session that Outbox.post uses, sending through
+    # http.client_ish so that connection failures surface as they do there
+    
+    def post(self, url, data=None, headers=None, timeout=None):
+        host, path = url.split("://", 1)[1].split("/", 1)
+        conn = http_client.HTTPConnection(host, timeout=timeout)
+        try:
+            conn.request("POST", "/" + path, body=data, headers=headers)
+            return conn.getresponse()
+        finally:
+            conn.close()
+
+
+def _remove(filename):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+
+
+class TestOutbox(unittest.TestCase):
+    
+    def setUp(self):
+        _remove(FILENAME)
+        _remove(FILENAME + ".off")
+        self._connect = http_client.HTTPConnection.connect
+    
+    def tearDown(self):
+        http_client.HTTPConnection.connect = self._connect
+        _remove(FILENAME)
+        _remove(FILENAME + ".off")
+    
+    def test_post_queues_when_connect_fails(self):
+        def connect(conn):
+            raise OSError(113)  # EHOSTUNREACH, surfaces as http_client.NotConnected
+        http_client.HTTPConnection.connect = connect
+        
+        box = Outbox(FILENAME)
+        result = box.post("http://192.0.2.1/telemetry", json={"t": 21.5}, session=DirectSession())
+        self.assertIsNone(result)
+        self.assertEqual(len(box), 1)
+        
+        # The record survives a restart
+        self.assertEqual(len(Outbox(FILENAME)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+# tests/test_websocket.py
+#
+# Frame handling of http.websocket against in-memory sockets. Run on the unix port
+# from the repo root:
+#     micropython tests/test_websocket.py
+
+import sys
+sys.path.insert(0, "")
+
+import io
+import unittest
+import asyncio
+import http.websocket as ws
+
+
+def frame(opcode, payload=b"", fin=True):
+    # An unmasked server frame
+    n = len(payload)
+    hdr = bytes(((0x80 if fin else 0) | opcode,))
+    if n < 126:
+        hdr += bytes((n,))
+    else:
+        hdr += bytes((126, n >> 8, n & 0xFF))
+    return hdr + payload
+
+def client_frames(data):
+    # Splits masked client output into [(opcode, fin, payload)]
+    frames = []
+    while data:
+        n = data[1] & 0x7F
+        i = 2
+        if n == 126:
+            n = (data[2] << 8) | data[3]
+            i = 4
+        key = data[i:i + 4]
+        i += 4
+        payload = bytes(b ^ key[j & 3] for j, b in enumerate(data[i:i + n]))
+        frames.append((data[0] & 0x0F, bool(data[0] & 0x80), payload))
+        data = data[i + n:]
+    return frames
+
+
+class FakeSocket:
+    # Returns at most 3 bytes per read to exercise partial reads
+    
+    def __init__(self, data):
+        self._in = io.BytesIO(data)
+        self.out = bytearray()
+        self.closed = False
+    
+    def readinto(self, buf, n=None):
+        n = len(buf) if n is None else n
+        data = self._in.read(min(n, 3))
+        buf[:len(data)] = data
+        return len(data)
+    
+    def sendall(self, data):
+        self.out.extend(bytes(data))
+    
+    def close(self):
+        self.closed = True
+
+
+class FakeStream(FakeSocket):
+    
+    async def readinto(self, buf):
+        return FakeSocket.readinto(self, buf)
+    
+    def write(self, data):
+        self.out.extend(bytes(data))
+    
+    async def drain(self):
+        pass
+    
+    async def wait_closed(self):
+        pass
+
+
+class YieldingStream(FakeStream):
+    # Yields to the event loop on every read and write, as a real socket may
+    
+    async def readinto(self, buf):
+        await asyncio.sleep(0)
+        return FakeSocket.readinto(self, buf)
+    
+    async def drain(self):
+        await asyncio.sleep(0)
+
+
+FRAGMENTED = frame(ws.OP_TEXT, b"abc", fin=False) + frame(ws.OP_PING, b"hi") + frame(ws.OP_CONT, b"def")
+CLOSE = frame(ws.OP_CLOSE, b"\x03\xe8")
+INTERLEAVED = frame(ws.OP_TEXT, b"abc", fin=False) + frame(ws.OP_BINARY, b"xyz") + frame(ws.OP_CONT, b"def")
+
+
+class TestWebSocket(unittest.TestCase):
+    
+    def test_fragmented_message(self):
+        sock = FakeSocket(FRAGMENTED + CLOSE)
+        w = ws.WebSocket(sock, blocksize=16)
+        self.assertEqual(w.recv(), "abcdef")
+        self.assertEqual(client_frames(bytes(sock.out)), [(ws.OP_PONG, True, b"hi")])
+        self.assertIsNone(w.recv())
+        self.assertTrue(w.closed)
+        self.assertEqual(w.close_code, 1000)
+        self.assertTrue(sock.closed)
+    
+    def test_recv_into_parts(self):
+        payload = bytes(range(200))
+        w = ws.WebSocket(FakeSocket(frame(ws.OP_BINARY, payload)), blocksize=16)
+        buf = bytearray(64)
+        got = bytearray()
+        while True:
+            n = w.recv_into(buf)
+            got.extend(buf[:n])
+            if w.done:
+                break
+        self.assertEqual(bytes(got), payload)
+        self.assertEqual(w.opcode, ws.OP_BINARY)
+    
+    def test_send_masked_in_blocks(self):
+        sock = FakeSocket(b"")
+        w = ws.WebSocket(sock, blocksize=16)
+        w.send(b"x" * 300)
+        self.assertEqual(client_frames(bytes(sock.out)), [(ws.OP_BINARY, True, b"x" * 300)])
+    
+    def test_data_frame_inside_fragmented_message(self):
+        sock = FakeSocket(INTERLEAVED)
+        w = ws.WebSocket(sock, blocksize=16)
+        self.assertIsNone(w.recv())
+        self.assertTrue(w.closed)
+        self.assertEqual(w.close_code, ws.CLOSE_PROTOCOL_ERROR)
+        self.assertEqual(client_frames(bytes(sock.out)), [(ws.OP_CLOSE, True, b"\x03\xea")])
+    
+    def test_continuation_without_message(self):
+        w = ws.WebSocket(FakeSocket(frame(ws.OP_CONT, b"abc")), blocksize=16)
+        self.assertIsNone(w.recv())
+        self.assertEqual(w.close_code, ws.CLOSE_PROTOCOL_ERROR)
+    
+    def test_close_handshake(self):
+        sock = FakeSocket(frame(ws.OP_TEXT, b"late") + CLOSE)
+        w = ws.WebSocket(sock, blocksize=16)
+        w.close()
+        self.assertTrue(w.closed)
+        self.assertEqual(w.close_code, 1000)
+        self.assertEqual(client_frames(bytes(sock.out)), [(ws.OP_CLOSE, True, b"\x03\xe8")])
+
+
+class TestAsyncWebSocket(unittest.TestCase):
+    
+    def test_fragmented_message(self):
+        async def main():
+            stream = FakeStream(FRAGMENTED + CLOSE)
+            w = ws.AsyncWebSocket(stream, blocksize=16)
+            self.assertEqual(await w.recv(), "abcdef")
+            self.assertIsNone(await w.recv())
+            self.assertEqual(client_frames(bytes(stream.out)),
+                             [(ws.OP_PONG, True, b"hi"), (ws.OP_CLOSE, True, b"\x03\xe8")])
+        asyncio.run(main())
+    
+    def test_data_frame_inside_fragmented_message(self):
+        async def main():
+            stream = FakeStream(INTERLEAVED)
+            w = ws.AsyncWebSocket(stream, blocksize=16)
+            self.assertIsNone(await w.recv())
+            self.assertEqual(w.close_code, ws.CLOSE_PROTOCOL_ERROR)
+            self.assertTrue(stream.closed)
+        asyncio.run(main())
+    
+    def test_send_while_receiving_ping(self):
+        async def main():
+            stream = YieldingStream(frame(ws.OP_PING, b"hi") + frame(ws.OP_TEXT, b"done"))
+            w = ws.AsyncWebSocket(stream, blocksize=16)
+            sender = asyncio.create_task(w.send(b"x" * 300))
+            self.assertEqual(await w.recv(), "done")
+            await sender
+            # Each frame goes out whole, whichever task got there first
+            self.assertEqual(sorted(client_frames(bytes(stream.out))),
+                             [(ws.OP_BINARY, True, b"x" * 300), (ws.OP_PONG, True, b"hi")])
+        asyncio.run(main())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,8 +7,11 @@ from uctypes import addressof
 __all__ = [
     "quote", "quote_plus", "quote_from_bytes",
     "unquote", "unquote_plus", "unquote_to_bytes",
-    "urlencode", "parse_qs", "parse_qsl", "urldecode", 
-    "urlsplit", "urlunsplit", "urljoin",
+    "quote_into", "quote_plus_into", "unquote_into", "unquote_inplace",
+    "urlencode", "urlencode_into", "urlencoded_length", "iter_urlencoded",
+    "parse_qs", "parse_qsl", "urldecode", "QueryView",
+    "urlsplit", "urlunsplit", "urljoin", "BaseURL",
+    "normalize_url", "normalize_urls", "URITemplate",
 ]
 
 _USES_RELATIVE = frozenset([
@@ -45,15 +48,28 @@ _SAFEBLOB_QUOTE_PLUS = array('I', [
     _SAFEBLOB_BASE_3
 ])
 
+# safeblob[0] flags: 0 = quote, 1 = quote_plus, 2 = quote but keep existing
+# %XX triplets (URI template reserved expansion).
+_QUOTE_KEEP_PCT = const(2)
+
+@micropython.viper
+def _is_hex(b: int) -> int:
+    if b >= 48 and b <= 57:
+        return 1
+    b |= 32 # lowercase
+    return 1 if b >= 97 and b <= 102 else 0
+
 @micropython.viper
-def _quote_helper(src: ptr8, srclen: int, safeblob_obj: object, res: ptr8) -> int:
+def _quote_into_helper(src: ptr8, srclen: int, safeblob_obj: object, res_obj: object) -> int:
+    # Single pass into a bounded buffer: writes what fits and returns the
+    # length the full result needs (> len(res_obj) means it was truncated).
+    # Pass _NO_ROOM to only measure.
     safeblob = ptr32(addressof(safeblob_obj))
-    write = int(res) != 0
-    modified = 0
+    res = ptr8(addressof(res_obj))
+    resmax = int(len(res_obj))
     reslen = 0
     b = 0
     
-    # Unpack safeblob into local variables for speed
     flags = safeblob[0]
     safe1 = safeblob[1] # 32-63
     safe2 = safeblob[2] # 64-95
@@ -67,11 +83,20 @@ def _quote_helper(src: ptr8, srclen: int, safeblob_obj: object, res: ptr8) -> in
         i += 1
         
         if b == 32 and flags == 1: # space and quote_plus
-            modified = 1
-            if write: res[reslen] = 43 # '+'
+            if reslen < resmax: res[reslen] = 43 # '+'
             reslen += 1
             continue
         
+        if b == 37 and flags == 2 and i + 1 < srclen: # '%' followed by two hex digits
+            if int(_is_hex(src[i])) and int(_is_hex(src[i + 1])):
+                if reslen + 3 <= resmax:
+                    res[reslen] = 37
+                    res[reslen + 1] = src[i]
+                    res[reslen + 2] = src[i + 1]
+                reslen += 3
+                i += 2
+                continue
+        
         if b < 32:
             is_safe = 0
         elif b < 64:
@@ -84,18 +109,21 @@ def _quote_helper(src: ptr8, srclen: int, safeblob_obj: object, res: ptr8) -> in
             is_safe = 0
         
         if is_safe:
-            if write: res[reslen] = b
+            if reslen < resmax: res[reslen] = b
             reslen += 1
         else:
-            modified = 1
-            if write:
+            if reslen + 3 <= resmax:
                 res[reslen] = 37 # '%'
                 res[reslen + 1] = hex_digits[b >> 4]
                 res[reslen + 2] = hex_digits[b & 0xF]
             reslen += 3
     
-    return reslen if modified else 0
+    return reslen
 
+_NO_ROOM = b""
+
+# Precompiles a safe set; the result can be passed as safe= to quote()
+# (flags=0) or quote_plus()/urlencode() (flags=1) to skip the lookup.
 def compile_safe(safe, flags=0):
     safeblob = array('I', [flags, _SAFEBLOB_BASE_1, _SAFEBLOB_BASE_2, _SAFEBLOB_BASE_3])
     for c in safe:
@@ -105,6 +133,30 @@ def compile_safe(safe, flags=0):
             safeblob[(c >> 5)] |= (1 << (c & 31))
     return safeblob
 
+# compile_safe() results keyed by safe, one dict per flags value (0 = quote,
+# 1 = quote_plus), so lookups don't allocate a key tuple.
+_SAFEBLOB_CACHE = ({}, {})
+_SAFEBLOB_CACHE_SIZE = const(8)
+
+def _get_safeblob(safe, flags):
+    # safe may also be a compile_safe() result, which is used as is.
+    if isinstance(safe, array):
+        if len(safe) != 4 or safe[0] != flags:
+            raise ValueError("safe was compiled for a different mode")
+        return safe
+    cache = _SAFEBLOB_CACHE[flags]
+    try:
+        return cache[safe]
+    except KeyError:
+        pass
+    except TypeError: # unhashable, e.g. bytearray
+        return compile_safe(safe, flags)
+    safeblob = compile_safe(safe, flags)
+    if len(cache) >= _SAFEBLOB_CACHE_SIZE:
+        cache.popitem()
+    cache[safe] = safeblob
+    return safeblob
+
 def _quote(s, safeblob):
     if isinstance(s, (memoryview, bytes, bytearray)):
         src = s
@@ -119,8 +171,10 @@ def _quote(s, safeblob):
     if srclen == 0:
         return ""
     
-    reslen = _quote_helper(src, srclen, safeblob, 0)
-    if reslen <= 0:
+    reslen = _quote_into_helper(src, srclen, safeblob, _NO_ROOM)
+    # Each unsafe byte takes 3, so an unchanged length means nothing was
+    # escaped, unless quote_plus turned spaces into '+'.
+    if reslen == srclen and (safeblob[0] != 1 or _mv_find(src, 32, 0, srclen) < 0):
         if isinstance(s, str):
             return s
         elif isinstance(s, (bytes, bytearray)):
@@ -129,26 +183,53 @@ def _quote(s, safeblob):
             return bytes(s).decode("ascii")
     
     res = bytearray(reslen)
-    _quote_helper(src, srclen, safeblob, addressof(res))
+    _quote_into_helper(src, srclen, safeblob, res)
     return res.decode("ascii")
 
 def quote(string, safe="/", encoding=None, errors=None): # encoding and errors are unused
     if safe == "/":
         return _quote(string, _SAFEBLOB_QUOTE)
     else:
-        return _quote(string, compile_safe(safe, 0))
+        return _quote(string, _get_safeblob(safe, 0))
 
 def quote_plus(string, safe="", encoding=None, errors=None): # encoding and errors are unused
     if safe == "":
         return _quote(string, _SAFEBLOB_QUOTE_PLUS)
     else:
-        return _quote(string, compile_safe(safe, 1))
+        return _quote(string, _get_safeblob(safe, 1))
 
 def quote_from_bytes(string, safe="/"):
     if safe == "/":
         return _quote(string, _SAFEBLOB_QUOTE)
     else:
-        return _quote(string, compile_safe(safe, 0))
+        return _quote(string, _get_safeblob(safe, 0))
+
+def _quote_into(s, buf, safeblob):
+    if isinstance(s, (memoryview, bytes, bytearray)):
+        src = s
+    else:
+        src = memoryview(s)
+    srclen = len(src)
+    if srclen == 0:
+        return 0
+    reslen = _quote_into_helper(src, srclen, safeblob, buf)
+    if reslen > len(buf):
+        raise ValueError("buffer too small")
+    return reslen
+
+# Extension: quotes into buf (bytearray or writable memoryview), returns length
+def quote_into(string, buf, safe="/"):
+    if safe == "/":
+        return _quote_into(string, buf, _SAFEBLOB_QUOTE)
+    else:
+        return _quote_into(string, buf, _get_safeblob(safe, 0))
+
+# Extension
+def quote_plus_into(string, buf, safe=""):
+    if safe == "":
+        return _quote_into(string, buf, _SAFEBLOB_QUOTE_PLUS)
+    else:
+        return _quote_into(string, buf, _get_safeblob(safe, 1))
 
 
 
@@ -256,6 +337,43 @@ def unquote_plus(s, encoding="utf-8", errors="replace"):
 def unquote_to_bytes(s) -> bytes:
     return _unquote(s, 0, None, 0)
 
+# Extension: unquotes s[start:end] into buf, returns length.
+# Decoding never grows the data, so buf as long as the source takes one pass.
+def unquote_into(s, buf, start=0, end=None, *, plus=False) -> int:
+    if isinstance(s, (memoryview, bytes, bytearray)):
+        src = s
+    else:
+        src = memoryview(s)
+    srclen = len(src)
+    if end is None or end > srclen:
+        end = srclen
+    if start < 0:
+        start = 0
+    if start >= end:
+        return 0
+    
+    flags = 1 if plus else 0
+    adr = addressof(src) + start
+    srclen = end - start
+    if len(buf) < srclen:
+        reslen = _unquote_helper(adr, srclen, flags, 0) or srclen
+        if reslen > len(buf):
+            raise ValueError("buffer too small")
+    return _unquote_helper(adr, srclen, flags, addressof(buf)) or srclen
+
+# Extension: unquotes buf[start:end] in place (the write position never
+# overtakes the read position), returns the new length of that region.
+def unquote_inplace(buf, start=0, end=None, *, plus=False) -> int:
+    buflen = len(buf)
+    if end is None or end > buflen:
+        end = buflen
+    if start < 0:
+        start = 0
+    if start >= end:
+        return 0
+    adr = addressof(buf) + start
+    return _unquote_helper(adr, end - start, 1 if plus else 0, adr) or (end - start)
+
 
 
 def _urlencode_generator(query, doseq=False, safe="", encoding=None, errors=None, quote_via=quote_plus):
@@ -280,6 +398,122 @@ def _urlencode_generator(query, doseq=False, safe="", encoding=None, errors=None
 def urlencode(query, *args, **kwargs) -> str:
     return "&".join(_urlencode_generator(query, *args, **kwargs))
 
+def _urlencode_pairs(query, doseq):
+    # Like _urlencode_generator, but yields the raw (key, value) pairs.
+    if isinstance(query, dict):
+        query = query.items()
+    for key, val in query:
+        if not isinstance(key, (str, bytes, bytearray, memoryview)):
+            key = str(key)
+        if isinstance(val, (str, bytes, bytearray, memoryview)):
+            yield key, val
+        elif doseq:
+            for v in val:
+                if not isinstance(v, (str, bytes, bytearray, memoryview)):
+                    v = str(v)
+                yield key, v
+        else:
+            yield key, str(val)
+
+def _urlencode_safeblob(safe):
+    if safe == "":
+        return _SAFEBLOB_QUOTE_PLUS
+    return _get_safeblob(safe, 1)
+
+# Extension: the length urlencode() would return, without building it
+def urlencoded_length(query, doseq=False, safe="") -> int:
+    safeblob = _urlencode_safeblob(safe)
+    total = 0
+    for key, val in _urlencode_pairs(query, doseq):
+        if total:
+            total += 1 # '&'
+        for part in (key, val):
+            src = part if isinstance(part, (memoryview, bytes, bytearray)) else memoryview(part)
+            if len(src):
+                total += _quote_into_helper(src, len(src), safeblob, _NO_ROOM)
+        total += 1 # '='
+    return total
+
+def _append_quoted(buf, pos, s, safeblob):
+    src = s if isinstance(s, (memoryview, bytes, bytearray)) else memoryview(s)
+    srclen = len(src)
+    if srclen == 0:
+        return pos
+    n = _quote_into_helper(src, srclen, safeblob, memoryview(buf)[pos:])
+    if pos + n > len(buf):
+        _grow(buf, pos + n)
+        _quote_into_helper(src, srclen, safeblob, memoryview(buf)[pos:])
+    return pos + n
+
+def _append_byte(buf, pos, b):
+    if pos >= len(buf):
+        _grow(buf, pos + 1)
+    buf[pos] = b
+    return pos + 1
+
+def _grow(buf, need):
+    size = len(buf)
+    new_size = 2 * size + 16
+    if new_size < need:
+        new_size = need
+    buf.extend(bytes(new_size - size))
+
+# Extension: urlencode() into bytearray buf in one pass, returns the length
+# (the Content-Length). buf is extended when too small; size it with
+# urlencoded_length() to avoid that.
+def urlencode_into(query, buf, doseq=False, safe="") -> int:
+    safeblob = _urlencode_safeblob(safe)
+    pos = 0
+    for key, val in _urlencode_pairs(query, doseq):
+        if pos:
+            pos = _append_byte(buf, pos, 38) # '&'
+        pos = _append_quoted(buf, pos, key, safeblob)
+        pos = _append_byte(buf, pos, 61) # '='
+        pos = _append_quoted(buf, pos, val, safeblob)
+    return pos
+
+# Extension: urlencode() as a stream of memoryview slices of buf, each valid
+# until the next iteration. Suitable as an HTTPConnection.send() body, with
+# Content-Length from urlencoded_length().
+def iter_urlencoded(query, buf, doseq=False, safe=""):
+    safeblob = _urlencode_safeblob(safe)
+    mv = buf if isinstance(buf, memoryview) else memoryview(buf)
+    size = len(mv)
+    if size < 3:
+        raise ValueError("buffer too small")
+    fill = 0
+    first = True
+    for key, val in _urlencode_pairs(query, doseq):
+        for sep, part in ((38, key), (61, val)): # '&', '='
+            if first:
+                first = False
+            else:
+                if fill == size:
+                    yield mv
+                    fill = 0
+                mv[fill] = sep
+                fill += 1
+            src = part if isinstance(part, (memoryview, bytes, bytearray)) else memoryview(part)
+            srclen = len(src)
+            adr = addressof(src)
+            pos = 0
+            while pos < srclen:
+                room = size - fill
+                k = srclen - pos
+                n = _quote_into_helper(adr + pos, k, safeblob, mv[fill:])
+                if n > room:
+                    # Doesn't fit: take what surely does, or flush.
+                    k = room // 3
+                    if k == 0:
+                        yield mv[:fill]
+                        fill = 0
+                        continue
+                    n = _quote_into_helper(adr + pos, k, safeblob, mv[fill:])
+                fill += n
+                pos += k
+    if fill:
+        yield mv[:fill]
+
 
 
 @micropython.viper
@@ -360,10 +594,276 @@ def urldecode(qs, *args, **kwargs) -> dict:
         res[key] = val
     return res
 
+@micropython.viper
+def _mv_equal(a: ptr8, b: ptr8, n: int) -> int:
+    i = 0
+    while i < n:
+        if a[i] != b[i]:
+            return 0
+        i += 1
+    return 1
+
+# Extension: a lazily decoded view of a query string. Field offsets are found
+# once (same rules as parse_qsl) and kept as (start, eq, end) triples in an
+# array; keys and values are only unquoted when a lookup needs them.
+class QueryView:
+    
+    def __init__(self, qs, keep_blank_values=False, strict_parsing=False,
+                 encoding="utf-8", errors="replace",
+                 max_num_fields=None, separator='&'):
+        if isinstance(qs, (memoryview, bytes, bytearray)):
+            src = qs
+        else:
+            src = memoryview(qs)
+        n = len(src)
+        self._qs = qs # keeps the buffer alive
+        self._src = src
+        self._encoding = encoding
+        self._errors = errors
+        self._scratch = None
+        self._index = index = array('H' if n < 65536 else 'I')
+        if n == 0:
+            return
+        
+        sep = ord(separator)
+        i = 0
+        num_fields = 0
+        while i <= n:
+            num_fields += 1
+            if max_num_fields is not None and num_fields > max_num_fields:
+                raise ValueError("max_num_fields exceeded")
+            j = _mv_find(src, sep, i, n)
+            if j < 0:
+                j = n
+            eq = _mv_find(src, 61, i, j) # '='
+            if eq >= 0:
+                if keep_blank_values or (eq + 1 < j):
+                    index.append(i)
+                    index.append(eq)
+                    index.append(j)
+            else:
+                if strict_parsing:
+                    raise ValueError("bad query field")
+                if keep_blank_values:
+                    index.append(i)
+                    index.append(j)
+                    index.append(j)
+            if j == n:
+                break
+            i = j + 1
+    
+    def __len__(self):
+        return len(self._index) // 3
+    
+    def _key_matches(self, f, key, keylen):
+        src = self._src
+        start = self._index[f]
+        eq = self._index[f + 1]
+        n = eq - start
+        if _mv_find(src, 37, start, eq) < 0 and _mv_find(src, 43, start, eq) < 0: # '%', '+'
+            return n == keylen and _mv_equal(addressof(src) + start, key, n)
+        if n < keylen:
+            return False
+        if self._scratch is None or len(self._scratch) < n:
+            self._scratch = bytearray(n)
+        m = _unquote_helper(addressof(src) + start, n, 1, addressof(self._scratch)) or n
+        return m == keylen and _mv_equal(self._scratch, key, m)
+    
+    def _find(self, key, f=0):
+        # Returns the index offset of the next field at or after f named key.
+        if not isinstance(key, (memoryview, bytes, bytearray)):
+            key = memoryview(key)
+        keylen = len(key)
+        index_len = len(self._index)
+        while f < index_len:
+            if self._key_matches(f, key, keylen):
+                return f
+            f += 3
+        return -1
+    
+    def _decode(self, start, end):
+        try:
+            return _unquote(self._src, start, end, 1).decode(self._encoding)
+        except UnicodeError:
+            if self._errors == "strict":
+                raise
+            return None
+    
+    def __contains__(self, key):
+        return self._find(key) >= 0
+    
+    def __getitem__(self, key):
+        f = self._find(key)
+        if f < 0:
+            raise KeyError(key)
+        return self._decode(self._index[f + 1] + 1, self._index[f + 2])
+    
+    def get(self, key, default=None):
+        f = self._find(key)
+        if f < 0:
+            return default
+        return self._decode(self._index[f + 1] + 1, self._index[f + 2])
+    
+    def getlist(self, key) -> list:
+        res = []
+        f = self._find(key)
+        while f >= 0:
+            val = self._decode(self._index[f + 1] + 1, self._index[f + 2])
+            if val is not None:
+                res.append(val)
+            f = self._find(key, f + 3)
+        return res
+    
+    def get_raw(self, key, default=None):
+        # The still-quoted value as a memoryview slice of the query string.
+        f = self._find(key)
+        if f < 0:
+            return default
+        start = self._index[f + 1] + 1
+        end = self._index[f + 2]
+        if start > end:
+            start = end
+        src = self._src if isinstance(self._src, memoryview) else memoryview(self._src)
+        return src[start:end]
+    
+    def get_into(self, key, buf) -> int:
+        # Unquotes the value into buf; returns its length, or -1 if missing.
+        f = self._find(key)
+        if f < 0:
+            return -1
+        return unquote_into(self._src, buf, self._index[f + 1] + 1, self._index[f + 2], plus=True)
+    
+    def keys(self):
+        index = self._index
+        for f in range(0, len(index), 3):
+            key = self._decode(index[f], index[f + 1])
+            if key is not None:
+                yield key
+    
+    def items(self):
+        index = self._index
+        for f in range(0, len(index), 3):
+            key = self._decode(index[f], index[f + 1])
+            val = self._decode(index[f + 1] + 1, index[f + 2])
+            if key is not None and val is not None:
+                yield key, val
+
+
 
+# Offsets filled in by _locsplit_scan and _urlsplit_scan. Shared scratch: the
+# callers copy the values out straight after the scan.
+_SPLIT_OFFSETS = array('i', [0, 0, 0, 0, 0, 0])
+
+@micropython.viper
+def _locsplit_scan(src: ptr8, srclen: int, out_obj: object) -> int:
+    # Returns 0 if src is not pure ASCII (byte offsets would not be str
+    # offsets). Otherwise fills out with:
+    #   [0] last '@' or -1            [1] first ':' before it or -1
+    #   [2] host start                [3] host end
+    #   [4] port string start or -1   [5] host needs lowercasing (0/1)
+    out = ptr32(addressof(out_obj))
+    at = -1
+    i = 0
+    while i < srclen:
+        b = src[i]
+        if b >= 128:
+            return 0
+        if b == 64: # '@'
+            at = i
+        i += 1
+    
+    ucolon = -1
+    i = 0
+    while i < at:
+        if src[i] == 58: # ':'
+            ucolon = i
+            break
+        i += 1
+    
+    hs = at + 1
+    he = srclen
+    ps = -1
+    if hs < srclen and src[hs] == 91: # '['
+        i = hs + 1
+        while i < srclen:
+            if src[i] == 93: # ']'
+                break
+            i += 1
+        if i < srclen:
+            hs += 1
+            he = i
+            if i + 1 < srclen:
+                ps = i + 1
+    else:
+        i = srclen - 1
+        while i >= hs:
+            if src[i] == 58: # ':'
+                he = i
+                ps = i
+                break
+            i -= 1
+    
+    # Only the part before a '%' zone ID is lowercased.
+    upper = 0
+    i = hs
+    while i < he:
+        b = src[i]
+        if b == 37: # '%'
+            break
+        if 65 <= b <= 90:
+            upper = 1
+        i += 1
+    
+    out[0] = at
+    out[1] = ucolon
+    out[2] = hs
+    out[3] = he
+    out[4] = ps
+    out[5] = upper
+    return 1
 
 # Extension
 def locsplit_as_tuple(netloc: str) -> tuple:
+    mv = memoryview(netloc)
+    o = _SPLIT_OFFSETS
+    if not _locsplit_scan(mv, len(mv), o):
+        return _locsplit_as_tuple_str(netloc)
+    at, ucolon, hs, he, ps, upper = o[0], o[1], o[2], o[3], o[4], o[5]
+    
+    if at >= 0:
+        if ucolon >= 0:
+            username, password = netloc[:ucolon], netloc[ucolon+1:at]
+        else:
+            username, password = netloc[:at], None
+    else:
+        username, password = None, None
+    
+    if hs < he:
+        host = netloc[hs:he]
+        if upper:
+            if (sep := host.find('%')) >= 0:
+                host = host[:sep].lower() + host[sep:]
+            else:
+                host = host.lower()
+    else:
+        host = None
+    
+    if ps < 0:
+        port = None
+    else:
+        port = netloc[ps:]
+        if port.startswith(":"):
+            try:
+                n = int(port[1:], 10)
+                if 0 <= n <= 65535:
+                    port = n
+            except ValueError:
+                pass
+    
+    return (username, password, host, port)
+
+# Fallback for netlocs containing non-ASCII characters
+def _locsplit_as_tuple_str(netloc: str) -> tuple:
     if (sep := netloc.rfind('@')) >= 0:
         userpass, hostport = netloc[:sep], netloc[sep+1:]
         if (sep := userpass.find(':')) >= 0:
@@ -410,6 +910,68 @@ def locsplit_as_tuple(netloc: str) -> tuple:
 def locsplit(netloc: str) -> tuple:
     return dict(zip(('username', 'password', 'hostname', 'port'), locsplit_as_tuple(netloc)))
 
+@micropython.viper
+def _urlsplit_scan(src: ptr8, srclen: int, allow_fragments: int, out_obj: object) -> int:
+    # Single pass over the URL. Returns 0 if src is not pure ASCII; otherwise
+    # fills out with:
+    #   [0] scheme ':' or -1    [1] netloc start or -1    [2] path start
+    #   [3] '?' or -1           [4] '#' or -1
+    out = ptr32(addressof(out_obj))
+    
+    # Scheme: the first ':' counts if it comes before any '/'.
+    colon = -1
+    i = 0
+    while i < srclen:
+        b = src[i]
+        if b >= 128:
+            return 0
+        if b == 58: # ':'
+            colon = i
+            break
+        if b == 47: # '/'
+            break
+        i += 1
+    pos = 0
+    if colon > 0 and ((65 <= src[0] <= 90) or (97 <= src[0] <= 122)):
+        pos = colon + 1
+    else:
+        colon = -1
+    
+    netloc = -1
+    if pos + 1 < srclen and src[pos] == 47 and src[pos + 1] == 47: # '//'
+        netloc = pos + 2
+        i = netloc
+        while i < srclen:
+            b = src[i]
+            if b >= 128:
+                return 0
+            if b == 47 or b == 63 or b == 35: # '/', '?', '#'
+                break
+            i += 1
+        pos = i
+    
+    query = -1
+    fragment = -1
+    i = pos
+    while i < srclen:
+        b = src[i]
+        if b >= 128:
+            return 0
+        if b == 35: # '#'
+            if allow_fragments and fragment < 0:
+                fragment = i
+        elif b == 63: # '?'
+            if query < 0 and fragment < 0:
+                query = i
+        i += 1
+    
+    out[0] = colon
+    out[1] = netloc
+    out[2] = pos
+    out[3] = query
+    out[4] = fragment
+    return 1
+
 # Derived from CPython (all bugs are mine)
 def urlsplit_as_tuple(url: str, scheme, allow_fragments: bool) -> tuple:
 #    assert (isinstance(url, str))
@@ -419,6 +981,27 @@ def urlsplit_as_tuple(url: str, scheme, allow_fragments: bool) -> tuple:
     if scheme: # and (ord(scheme[0]) <= 32 or ord(scheme[-1]) <= 32):
         scheme = scheme.strip()
     
+    mv = memoryview(url)
+    n = len(mv)
+    o = _SPLIT_OFFSETS
+    if not _urlsplit_scan(mv, n, 1 if allow_fragments else 0, o):
+        return _urlsplit_as_tuple_str(url, scheme, allow_fragments)
+    colon, ns, ps, qi, fi = o[0], o[1], o[2], o[3], o[4]
+    
+    if colon >= 0:
+        scheme = url[:colon].lower()
+    netloc = url[ns:ps] if ns >= 0 else None
+    fragment = query = None
+    if fi >= 0:
+        fragment = url[fi+1:]
+        n = fi
+    if qi >= 0:
+        query = url[qi+1:n]
+        n = qi
+    return (scheme, netloc, url[ps:n], query, fragment)
+
+# Fallback for URLs containing non-ASCII characters
+def _urlsplit_as_tuple_str(url: str, scheme, allow_fragments: bool) -> tuple:
     netloc = query = fragment = None
     if (colon := url.find(':')) > 0 and url[0].isalpha():
         if (slash := url.find('/')) < 0 or colon < slash:
@@ -442,9 +1025,17 @@ class SplitResult(tuple):
     
     def __init__(self, scheme, netloc, path, query, fragment):
         super().__init__((scheme or "", netloc or "", path, query or "", fragment or ""))
-        self.username, self.password, self.hostname, self._port = locsplit_as_tuple(self[1])
 #        self._args = (scheme, netloc, path, query, fragment)
     
+    def _locsplit(self):
+        # The netloc is only decomposed (and cached) once one of its parts is
+        # asked for; until then the object holds nothing but the tuple.
+        try:
+            return self._loc
+        except AttributeError:
+            self._loc = loc = locsplit_as_tuple(self[1])
+            return loc
+    
     @property
     def scheme(self): return self[0]
     
@@ -460,12 +1051,22 @@ class SplitResult(tuple):
     @property
     def fragment(self): return self[4]
     
+    @property
+    def username(self): return self._locsplit()[0]
+    
+    @property
+    def password(self): return self._locsplit()[1]
+    
+    @property
+    def hostname(self): return self._locsplit()[2]
+    
     @property
     def port(self):
-        if self._port == ":":
+        port = self._locsplit()[3]
+        if port == ":":
             return None
-        if self._port is None or isinstance(self._port, int):
-            return self._port
+        if port is None or isinstance(port, int):
+            return port
         raise ValueError("bad port number")
     
     def geturl(self):
@@ -516,6 +1117,35 @@ def urlunsplit(components: tuple) -> str:
 
 
 
+def _base_dirs(bpath):
+    base_parts = bpath.split('/')
+    if base_parts[-1] != "":
+        # the last item is not a directory, so will not be taken into account
+        # in resolving the relative path
+        del base_parts[-1]
+    return base_parts
+
+# Extension: a base URL split (and its path segmented) once, for resolving
+# many references against it.
+class BaseURL:
+    
+    def __init__(self, base: str, allow_fragments: bool=True):
+        self.base = base
+        self.allow_fragments = allow_fragments
+        self._parts = urlsplit_as_tuple(base, None, allow_fragments) if base else None
+        self._dirs = _base_dirs(self._parts[2]) if base else None
+    
+    def join(self, url: str) -> str:
+        if not self.base:
+            return url
+        if not url:
+            return self.base
+        return _urljoin(self._parts, self._dirs, url, self.allow_fragments)
+
+# Recently used bases for urljoin(), one dict per allow_fragments value.
+_BASEURL_CACHE = ({}, {})
+_BASEURL_CACHE_SIZE = const(4)
+
 # Derived from CPython (all bugs are mine)
 def urljoin(base: str, url: str, allow_fragments: bool=True) -> str:
     if not base:
@@ -523,7 +1153,19 @@ def urljoin(base: str, url: str, allow_fragments: bool=True) -> str:
     if not url:
         return base
     
-    bscheme, bnetloc, bpath, bquery, bfragment = urlsplit_as_tuple(base, None, allow_fragments)
+    cache = _BASEURL_CACHE[1 if allow_fragments else 0]
+    b = cache.get(base)
+    if b is None:
+        b = BaseURL(base, allow_fragments)
+        if len(cache) >= _BASEURL_CACHE_SIZE:
+            cache.popitem()
+        cache[base] = b
+    return _urljoin(b._parts, b._dirs, url, allow_fragments)
+
+def _urljoin(bparts, bdirs, url, allow_fragments):
+    # bdirs is the base path split on '/' with its last (file) segment
+    # dropped; only read, never modified.
+    bscheme, bnetloc, bpath, bquery, bfragment = bparts
     scheme, netloc, path, query, fragment = urlsplit_as_tuple(url, None, allow_fragments)
     
     if scheme is None:
@@ -543,17 +1185,11 @@ def urljoin(base: str, url: str, allow_fragments: bool=True) -> str:
                 fragment = bfragment
         return _urlunsplit(scheme, netloc, path, query, fragment)
     
-    base_parts = bpath.split('/')
-    if base_parts[-1] != "":
-        # the last item is not a directory, so will not be taken into account
-        # in resolving the relative path
-        del base_parts[-1]
-    
     # for rfc3986, ignore all base path should the first character be root.
     if path[0] == '/': # `not path` was already checked earlier
         segments = path.split('/')
     else:
-        segments = base_parts + path.split('/')
+        segments = bdirs + path.split('/')
         # Remove empty segments in the middle (keep first and last as-is)
         w = 1
         for r in range(1, len(segments) - 1):
@@ -578,3 +1214,310 @@ def urljoin(base: str, url: str, allow_fragments: bool=True) -> str:
         resolved_path.append("")
     
     return _urlunsplit(scheme, netloc, "/".join(resolved_path) or "/", query, fragment)
+
+
+
+@micropython.viper
+def _pct_normalize(src: ptr8, srclen: int, safeblob_obj: object, res: ptr8) -> int:
+    # Uppercases the hex digits of %XX escapes and decodes the ones that
+    # encode a character marked safe in safeblob (the unreserved set).
+    # The output is never longer than the input, so res may equal src.
+    safeblob = ptr32(addressof(safeblob_obj))
+    hex_to_int = ptr8(addressof(_HEX_TO_INT))
+    hex_digits = ptr8(addressof(_HEX_DIGITS))
+    reslen = 0
+    i = 0
+    while i < srclen:
+        b = src[i]
+        i += 1
+        if b == 37 and i + 1 < srclen: # '%'
+            n1 = hex_to_int[src[i]]
+            n2 = hex_to_int[src[i + 1]]
+            if n1 != 255 and n2 != 255:
+                i += 2
+                c = (n1 << 4) | n2
+                if 32 <= c < 128 and (safeblob[c >> 5] >> (c & 31)) & 1:
+                    res[reslen] = c
+                    reslen += 1
+                else:
+                    res[reslen] = 37
+                    res[reslen + 1] = hex_digits[n1]
+                    res[reslen + 2] = hex_digits[n2]
+                    reslen += 3
+                continue
+        res[reslen] = b
+        reslen += 1
+    return reslen
+
+_DEFAULT_PORTS = {"http": 80, "https": 443, "ws": 80, "wss": 443, "ftp": 21, "rtsp": 554}
+
+def _remove_dot_segments(path: str) -> str:
+    if "." not in path:
+        return path
+    segments = path.split('/')
+    resolved = []
+    for seg in segments:
+        if seg == "..":
+            # never pop the empty segment that makes the path absolute
+            if len(resolved) > 1 or (resolved and resolved[0]):
+                resolved.pop()
+        elif seg != ".":
+            resolved.append(seg)
+    if segments[-1] in (".", ".."):
+        resolved.append("")
+    res = "/".join(resolved)
+    if path[0] == '/' and not res.startswith("/"):
+        res = "/" + res
+    return res
+
+def _query_key(field):
+    sep = field.find('=')
+    return field if sep < 0 else field[:sep]
+
+def _sort_query(fields):
+    # MicroPython's list.sort is not stable; the index keeps repeated keys in order.
+    keyed = [(_query_key(field), i, field) for i, field in enumerate(fields)]
+    keyed.sort()
+    return [field for _, _, field in keyed]
+
+def _normalize_url(url, scratch, sort_query, drop_fragment):
+    src = url if isinstance(url, (memoryview, bytes, bytearray)) else memoryview(url)
+    srclen = len(src)
+    if len(scratch) < srclen:
+        scratch.extend(bytes(srclen - len(scratch)))
+    n = _pct_normalize(src, srclen, _SAFEBLOB_QUOTE_PLUS, scratch)
+    url = str(memoryview(scratch)[:n], "utf-8")
+    
+    scheme, netloc, path, query, fragment = urlsplit_as_tuple(url, None, True)
+    
+    if netloc is not None:
+        username, password, host, port = locsplit_as_tuple(netloc)
+        if port == ":" or (scheme is not None and port == _DEFAULT_PORTS.get(scheme)):
+            port = None
+        parts = []
+        if username is not None:
+            parts.append(username)
+            if password is not None:
+                parts.append(":")
+                parts.append(password)
+            parts.append("@")
+        if host:
+            if ':' in host:
+                parts.append("[")
+                parts.append(host)
+                parts.append("]")
+            else:
+                parts.append(host)
+        if isinstance(port, int):
+            parts.append(":%d" % (port,))
+        elif port is not None:
+            parts.append(port)
+        netloc = "".join(parts)
+        if not path:
+            path = "/"
+    
+    if path:
+        path = _remove_dot_segments(path)
+    
+    if not query:
+        query = None
+    elif sort_query and '&' in query:
+        query = "&".join(_sort_query(query.split('&')))
+    
+    if drop_fragment or not fragment:
+        fragment = None
+    
+    return _urlunsplit(scheme, netloc, path, query, fragment)
+
+# Extension: canonical form of a URL for deduplication and cache keys.
+# Lowercases scheme and host, drops default and empty ports, normalizes
+# %XX escapes (uppercase hex, unreserved characters decoded), removes dot
+# segments, drops an empty query/fragment and (optionally) sorts the query
+# fields by key, keeping the order of repeated keys.
+def normalize_url(url, *, sort_query=True, drop_fragment=False) -> str:
+    return _normalize_url(url, bytearray(len(url)), sort_query, drop_fragment)
+
+# Extension: normalize_url() over many URLs, sharing one scratch buffer.
+def normalize_urls(urls, *, sort_query=True, drop_fragment=False) -> list:
+    scratch = bytearray(128)
+    return [_normalize_url(url, scratch, sort_query, drop_fragment) for url in urls]
+
+
+
+# RFC 6570 URI templates (level 4). Reserved expansion ("+" and "#") and
+# literals keep existing pct-encoded triplets; any other '%' becomes %25.
+_SAFEBLOB_UNRESERVED = compile_safe("", 0)
+_SAFEBLOB_RESERVED = compile_safe(":/?#[]@!$&'()*+,;=", _QUOTE_KEEP_PCT)
+
+# operator -> (first, separator, named, if-empty, safeblob)
+_TEMPLATE_OPS = {
+    "":  (b"",  b",", False, b"",  _SAFEBLOB_UNRESERVED),
+    "+": (b"",  b",", False, b"",  _SAFEBLOB_RESERVED),
+    "#": (b"#", b",", False, b"",  _SAFEBLOB_RESERVED),
+    ".": (b".", b".", False, b"",  _SAFEBLOB_UNRESERVED),
+    "/": (b"/", b"/", False, b"",  _SAFEBLOB_UNRESERVED),
+    ";": (b";", b";", True,  b"",  _SAFEBLOB_UNRESERVED),
+    "?": (b"?", b"&", True,  b"=", _SAFEBLOB_UNRESERVED),
+    "&": (b"&", b"&", True,  b"=", _SAFEBLOB_UNRESERVED),
+}
+
+def _append_bytes(buf, pos, b):
+    n = len(b)
+    if pos + n > len(buf):
+        _grow(buf, pos + n)
+    buf[pos:pos + n] = b
+    return pos + n
+
+def _template_value(value):
+    if isinstance(value, (str, bytes, bytearray)):
+        return value
+    return str(value)
+
+def _compile_expression(expr):
+    if expr and expr[0] in _TEMPLATE_OPS:
+        op, expr = expr[0], expr[1:]
+    elif expr and expr[0] in "=,!@|":
+        raise ValueError("reserved operator")
+    else:
+        op = ""
+    varspecs = []
+    for spec in expr.split(','):
+        explode = False
+        prefix = 0
+        if spec.endswith('*'):
+            explode = True
+            spec = spec[:-1]
+        elif (sep := spec.find(':')) >= 0:
+            try:
+                prefix = int(spec[sep+1:], 10)
+            except ValueError:
+                prefix = 0
+            if not (0 < prefix < 10000):
+                raise ValueError("bad prefix modifier")
+            spec = spec[:sep]
+        if not spec:
+            raise ValueError("empty variable name")
+        varspecs.append((spec, spec.encode("utf-8"), prefix, explode))
+    return (_TEMPLATE_OPS[op], tuple(varspecs))
+
+# Extension: a URI template compiled once into literal and expression segments.
+class URITemplate:
+    
+    def __init__(self, template: str):
+        self.template = template
+        self._buf = bytearray(len(template) + 32)
+        segments = []
+        i = 0
+        n = len(template)
+        while i < n:
+            j = template.find('{', i)
+            if j < 0:
+                j = n
+            if j > i:
+                segments.append(_quote(template[i:j], _SAFEBLOB_RESERVED).encode("utf-8"))
+            if j == n:
+                break
+            k = template.find('}', j)
+            if k < 0:
+                raise ValueError("unclosed expression")
+            segments.append(_compile_expression(template[j+1:k]))
+            i = k + 1
+        self._segments = segments
+    
+    def expand_into(self, buf, variables=None, **kwargs) -> int:
+        # Writes the expansion into bytearray buf (extended if too small),
+        # returns its length.
+        if variables is None:
+            variables = kwargs
+        elif kwargs:
+            variables = dict(variables)
+            variables.update(kwargs)
+        pos = 0
+        for seg in self._segments:
+            if isinstance(seg, bytes):
+                pos = _append_bytes(buf, pos, seg)
+            else:
+                pos = self._expand_expression(buf, pos, seg, variables)
+        return pos
+    
+    def expand(self, variables=None, **kwargs) -> str:
+        n = self.expand_into(self._buf, variables, **kwargs)
+        return str(memoryview(self._buf)[:n], "utf-8")
+    
+    def _expand_expression(self, buf, pos, seg, variables):
+        (first, sep, named, ifemp, safeblob), varspecs = seg
+        written = False
+        for name, bname, prefix, explode in varspecs:
+            value = variables.get(name)
+            if value is None:
+                continue
+            is_dict = isinstance(value, dict)
+            if is_dict or isinstance(value, (list, tuple)):
+                if not value:
+                    continue
+            else:
+                value = _template_value(value)
+            
+            pos = _append_bytes(buf, pos, sep if written else first)
+            written = True
+            
+            if is_dict:
+                items = value.items()
+            elif isinstance(value, (list, tuple)):
+                items = None
+            else:
+                if named:
+                    pos = _append_bytes(buf, pos, bname)
+                    if not value:
+                        pos = _append_bytes(buf, pos, ifemp)
+                        continue
+                    pos = _append_byte(buf, pos, 61) # '='
+                if prefix:
+                    value = value[:prefix]
+                pos = _append_quoted(buf, pos, value, safeblob)
+                continue
+            
+            if not explode:
+                if named:
+                    pos = _append_bytes(buf, pos, bname)
+                    pos = _append_byte(buf, pos, 61) # '='
+                if items is None:
+                    for i, v in enumerate(value):
+                        if i:
+                            pos = _append_byte(buf, pos, 44) # ','
+                        pos = _append_quoted(buf, pos, _template_value(v), safeblob)
+                else:
+                    i = 0
+                    for k, v in items:
+                        if i:
+                            pos = _append_byte(buf, pos, 44) # ','
+                        pos = _append_quoted(buf, pos, _template_value(k), safeblob)
+                        pos = _append_byte(buf, pos, 44) # ','
+                        pos = _append_quoted(buf, pos, _template_value(v), safeblob)
+                        i += 1
+            elif items is None:
+                for i, v in enumerate(value):
+                    if i:
+                        pos = _append_bytes(buf, pos, sep)
+                    v = _template_value(v)
+                    if named:
+                        pos = _append_bytes(buf, pos, bname)
+                        if not v:
+                            pos = _append_bytes(buf, pos, ifemp)
+                            continue
+                        pos = _append_byte(buf, pos, 61) # '='
+                    pos = _append_quoted(buf, pos, v, safeblob)
+            else:
+                i = 0
+                for k, v in items:
+                    if i:
+                        pos = _append_bytes(buf, pos, sep)
+                    i += 1
+                    v = _template_value(v)
+                    pos = _append_quoted(buf, pos, _template_value(k), safeblob)
+                    if named and not v:
+                        pos = _append_bytes(buf, pos, ifemp)
+                        continue
+                    pos = _append_byte(buf, pos, 61) # '='
+                    pos = _append_quoted(buf, pos, v, safeblob)
+        return pos